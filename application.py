@@ -1,10 +1,23 @@
 from PyQt5.QtWidgets import QApplication, QLabel, QPushButton, QVBoxLayout, QWidget, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
+import os
 import sys
-from modules.signup_window import SignUpWindow
-from modules.signin_window import SignInWindow
-from modules.delete_window import DeleteAccountWindow
-from modules.auth_utils import connect_to_cloud_db
+import threading
+# modules/ import each other by bare name, so shared state (model, audio, engines) lives in one module object
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules"))
+import startup_profile
+if "--profile-startup" in sys.argv or "--check-startup-budget" in sys.argv:
+    startup_profile.main(os.path.abspath(__file__), sys.argv)
+# first: it loads .env, which auth_utils' MONGO_* pool settings are read from
+from test_driver_drowsiness_detector_module import (LOCAL_STORE_PATH, SESSION_WAL_DIR, SYNC_BATCH_SIZE,
+                                                    SYNC_RETRY_MAX_SECONDS, UI_STALL_REPORT_MS, preload_model)
+# bare names, as the windows use: "modules.auth_utils" would be a second module with its own MongoClient
+from signup_window import SignUpWindow
+from signin_window import SignInWindow
+from delete_window import DeleteAccountWindow
+from auth_utils import connect_to_cloud_db
+from local_store import LocalStore, SessionSync, import_wal_dir
+from ui_tasks import UIStallMonitor, submit
 
 class DriverLoginGUI(QWidget):
     def __init__(self):
@@ -12,12 +25,23 @@ class DriverLoginGUI(QWidget):
         self.setWindowTitle("Driver Login Panel")
         self.setFixedSize(400, 300)
 
-        # Connect to MongoDB
-        try:
-            self.users_col, self.sessions_col = connect_to_cloud_db()
-        except Exception as e:
-            QMessageBox.critical(self, "Database Error", f"Could not connect to cloud DB: {e}")
-            sys.exit(1)
+        # Sessions and credentials are kept locally; the cloud is synced in the background
+        self.store = LocalStore(LOCAL_STORE_PATH)
+        import_wal_dir(self.store, SESSION_WAL_DIR)
+        self.sync = SessionSync(self.store, connect_to_cloud_db, batch_size=SYNC_BATCH_SIZE,
+                                retry_max=SYNC_RETRY_MAX_SECONDS)
+        # the first sync attempt connects (a mongodb+srv URI resolves DNS), never the GUI thread
+        self.sync.start()
+        self.sync.kick()  # push whatever a crash or dead zone left unsent
+
+        # Optional watchdog that logs whenever something blocks the GUI thread
+        self.stall_monitor = None
+        if UI_STALL_REPORT_MS:
+            self.stall_monitor = UIStallMonitor(report_over_ms=UI_STALL_REPORT_MS)
+            self.stall_monitor.start()
+
+        # Detector weights and the monitoring stack (cv2, pandas, ultralytics) load once the panel is up
+        QTimer.singleShot(0, self.load_in_background)
 
         # Title label
         title_label = QLabel("Hello Driver!", self)
@@ -44,18 +68,31 @@ class DriverLoginGUI(QWidget):
 
         self.setLayout(layout)
 
+    def load_in_background(self):
+        preload_model()
+        threading.Thread(target=__import__, args=("monitoring_window",), daemon=True).start()
+
     def sign_up(self):
-        signup_dialog = SignUpWindow(self.users_col)
+        self.try_reconnect()
+        signup_dialog = SignUpWindow(self.sync.users_col)
         signup_dialog.exec_()
 
     def sign_in(self):
-        signin_dialog = SignInWindow(self.users_col, self.sessions_col)
+        self.try_reconnect()
+        signin_dialog = SignInWindow(self.sync.users_col, self.sync)
         signin_dialog.exec_()
 
     def delete_account(self):
-        delete_dialog = DeleteAccountWindow(self.users_col, self.sessions_col)
+        self.try_reconnect()
+        delete_dialog = DeleteAccountWindow(self.sync.users_col, self.sync.sessions_col, self.store)
         delete_dialog.exec_()
 
+    def try_reconnect(self):
+        # the dialog opens straight away (offline if need be); the next one gets the connection
+        if self.sync.sessions_col is None:
+            submit(self.sync.ensure_connected,
+                   on_error=lambda e: print(f"[WARN] Cloud DB still unavailable: {e}"))
+
     def closeEvent(self, event):
         reply = QMessageBox.question(
             self, "Exit Confirmation",
@@ -63,6 +100,8 @@ class DriverLoginGUI(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
+            if self.stall_monitor:
+                print(f"[INFO] GUI stalls: {self.stall_monitor.report()}")
             event.accept()
         else:
             event.ignore()
@@ -71,4 +110,6 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = DriverLoginGUI()
     window.show()
+    if startup_profile.is_probe():
+        QTimer.singleShot(0, lambda: (startup_profile.ready(), app.quit()))
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,121 @@
+'''event bus between the monitoring thread and the GUI.
+
+the worker raises typed alert events and keeps analysing frames; the GUI shows a
+non-modal prompt and answers asynchronously. replies travel back through a plain
+queue the worker drains once per frame, so it never waits on the driver.'''
+import itertools
+import queue
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+REROUTE, DISMISS, TIMEOUT = "reroute", "dismiss", "timeout"
+
+
+class AlertEvent:
+    __slots__ = ("alert_id", "state", "msg", "sound", "raised_at", "level", "timeout")
+
+    def __init__(self, alert_id, state, msg, sound, raised_at, level=0, timeout=15.0):
+        self.alert_id = alert_id
+        self.state = state
+        self.msg = msg
+        self.sound = sound
+        self.raised_at = raised_at
+        self.level = level  # 0 = first prompt, +1 per unanswered timeout
+        self.timeout = timeout
+
+
+class PromptReply:
+    __slots__ = ("alert_id", "choice", "replied_at")
+
+    def __init__(self, alert_id, choice, replied_at=None):
+        self.alert_id = alert_id
+        self.choice = choice  # REROUTE | DISMISS | TIMEOUT
+        self.replied_at = replied_at if replied_at is not None else time.monotonic()
+
+
+# =========================
+# 🚌 Bus
+# =========================
+class AlertBus(QObject):
+    # worker -> GUI, delivered on the GUI thread
+    alert_raised = pyqtSignal(object)
+    alert_cleared = pyqtSignal(int)
+
+    def __init__(self):
+        super().__init__()
+        self.replies = queue.Queue()
+
+    def raise_alert(self, event):
+        self.alert_raised.emit(event)
+
+    def clear_alert(self, alert_id):
+        self.alert_cleared.emit(alert_id)
+
+    def reply(self, reply):
+        '''GUI -> worker, safe from any thread'''
+        self.replies.put(reply)
+
+    def drain_replies(self):
+        out = []
+        while True:
+            try:
+                out.append(self.replies.get_nowait())
+            except queue.Empty:
+                return out
+
+
+# =========================
+# 🪜 Prompt policy
+# =========================
+_alert_ids = itertools.count(1)  # process-wide, so a reply can't match a later session's prompt
+
+
+class PromptPolicy:
+    '''decides, on the worker side, what a MODERATE frame or a prompt reply means.
+
+    one prompt is open at a time; while it is, further MODERATE frames don't stack
+    prompts. an unanswered prompt is re-raised louder (strong alarm) up to
+    max_escalations times, after which the driver is rerouted as if STRONG.'''
+
+    def __init__(self, bus, timeout=15.0, max_escalations=1, clock=time.monotonic):
+        self.bus = bus
+        self.timeout = timeout
+        self.max_escalations = max_escalations
+        self.clock = clock
+        self.ids = _alert_ids
+        self.open = None  # the AlertEvent waiting for a reply
+
+    def moderate(self, msg, sound):
+        '''returns the raised AlertEvent, or None if a prompt is already open'''
+        if self.open is not None:
+            return None
+        return self._raise("MODERATE", msg, sound, level=0)
+
+    def _raise(self, state, msg, sound, level):
+        self.open = AlertEvent(next(self.ids), state, msg, sound, self.clock(), level, self.timeout)
+        self.bus.raise_alert(self.open)
+        return self.open
+
+    def poll(self):
+        '''handles queued replies; returns (action, event) with action one of
+        None, REROUTE, DISMISS, or "escalate" (a louder prompt was raised)'''
+        for reply in self.bus.drain_replies():
+            if self.open is None or reply.alert_id != self.open.alert_id:
+                continue  # answer to a prompt that was already superseded
+            event = self.open
+            self.open = None
+            if reply.choice == TIMEOUT:
+                if event.level >= self.max_escalations:
+                    return REROUTE, event
+                return "escalate", self._raise(
+                    event.state, "⏰ No response. Please confirm you are alert.",
+                    "strong_alarm", event.level + 1)
+            return reply.choice, event
+        return None, None
+
+    def close(self):
+        '''withdraws the open prompt (session ending or escalated to STRONG)'''
+        if self.open is not None:
+            self.bus.clear_alert(self.open.alert_id)
+            self.open = None
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+
+
+# =========================
+# 🔈 Audio backends
+# =========================
+class NullAudioBackend:
+    '''silent backend for machines without a sound device (CI, headless boxes).
+    records what would have been played so callers can be checked.'''
+
+    def __init__(self, clip_length=0.0):
+        self.clip_length = clip_length
+        self.history = []  # (sound_type, started_at)
+        self.busy_until = 0.0
+
+    def load(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def play(self, sound_type, clip):
+        self.history.append((sound_type, time.time()))
+        self.busy_until = time.time() + self.clip_length
+
+    def stop(self):
+        self.busy_until = 0.0
+
+    def is_busy(self):
+        return time.time() < self.busy_until
+
+
+class PygameAudioBackend:
+    '''mixer is initialised once and clips are decoded into memory up front,
+    playback runs on a reserved channel and returns immediately'''
+
+    def __init__(self):
+        import pygame
+        self.pygame = pygame
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+
+    def load(self, path):
+        return self.pygame.mixer.Sound(path)
+
+    def play(self, sound_type, clip):
+        self.channel.play(clip)  # replaces whatever the channel was playing
+
+    def stop(self):
+        self.channel.stop()
+
+    def is_busy(self):
+        return self.channel.get_busy()
+
+
+def create_backend(name="pygame"):
+    if name == "null":
+        return NullAudioBackend()
+    try:
+        return PygameAudioBackend()
+    except Exception as e:
+        print(f"[WARN] Audio unavailable ({e}), alerts will be silent")
+        return NullAudioBackend()
+
+
+# =========================
+# 🚨 Alert player
+# =========================
+class AlertPlayer:
+    '''non-blocking alert playback: a higher priority alert preempts a lower one,
+    a lower priority alert is dropped while a higher one is still sounding'''
+
+    PRIORITY = {"alarm": 1, "strong_alarm": 2}
+
+    def __init__(self, sound_map, backend, path_resolver=None):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.current = None
+        self.clips = {}
+        for sound_type, rel_path in sound_map.items():
+            path = path_resolver(rel_path) if path_resolver else rel_path
+            try:
+                self.clips[sound_type] = backend.load(path)
+            except Exception as e:
+                print(f"[ERROR] Failed to load sound '{sound_type}': {e}")
+
+    def play(self, sound_type):
+        clip = self.clips.get(sound_type)
+        if clip is None:
+            return False
+        with self.lock:
+            if self.current and self.backend.is_busy():
+                if self.PRIORITY.get(sound_type, 0) < self.PRIORITY.get(self.current, 0):
+                    return False
+            self.backend.play(sound_type, clip)
+            self.current = sound_type
+            return True
+
+    def stop(self):
+        with self.lock:
+            self.backend.stop()
+            self.current = None
+
+    def is_playing(self):
+        return self.backend.is_busy()
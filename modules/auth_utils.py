@@ -1,8 +1,20 @@
 import os
+import threading
 import bcrypt
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
 from urllib.parse import quote_plus
 
+# One pooled client for the whole app; the timeouts bound how long an offline call blocks a worker
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "10"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "1"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+
+_client = None
+_client_lock = threading.Lock()
+_user_index_ready = False
+
 def connect_to_cloud_db():
     # if your username or password contains any special character then use the quote_plus for percent encoding
     user_name = quote_plus("user_name")
@@ -10,35 +22,84 @@ def connect_to_cloud_db():
     uri = "MONGODB_URI"  # Load URI securely from environment
     if not uri:
         raise ValueError("MONGODB_URI not set in environment")
-    client = MongoClient(uri)
-    db = client["project_name"]
+    # every window and the sync worker share this client and its connection pool
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(
+                uri,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            )
+    db = _client["project_name"]
     users_col = db["users"]
     sessions_col = db["sessions"]
     return users_col, sessions_col
 
+def ensure_user_index(users_col):
+    # usernames are unique in the DB itself, so sign-up is a single insert
+    global _user_index_ready
+    if not _user_index_ready:
+        try:
+            users_col.create_index([("username", ASCENDING)], unique=True)
+            _user_index_ready = True
+        except OperationFailure as e:
+            print(f"[WARN] Could not create unique username index (existing duplicates?): {e}")
+    return _user_index_ready
+
 def sign_up(users_col, username, password):
-    # Check if user already exists
-    if users_col.find_one({"username": username}):
+    if users_col is None:
+        raise ConnectionError("Creating an account needs a connection to the cloud database")
+
+    # Without the unique index, fall back to checking first
+    if not ensure_user_index(users_col) and users_col.find_one({"username": username}):
         return False
 
     pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    users_col.insert_one({
-        "username": username,
-        "pw_hash": pw_hash,
-        "session_data": []  # Optional placeholder for future session tracking
-    })
+    try:
+        users_col.insert_one({
+            "username": username,
+            "pw_hash": pw_hash,
+            "session_data": []  # Optional placeholder for future session tracking
+        })
+    except DuplicateKeyError:
+        return False
 
     return True
 
-def sign_in(users_col, username, password):
-    user = users_col.find_one({"username": username})
-    if not user:
-        return False
-    return bcrypt.checkpw(password.encode(), user["pw_hash"])
+def sign_in(users_col, username, password, store=None):
+    # checks against the cloud and caches the hash; falls back to the cached hash while offline
+    if users_col is not None:
+        try:
+            user = users_col.find_one({"username": username})
+        except PyMongoError as e:
+            print(f"[WARN] Cloud sign-in unavailable, using cached credentials: {e}")
+        else:
+            if not user:
+                return False
+            if store is not None:
+                store.cache_credentials(username, user["pw_hash"])
+            return bcrypt.checkpw(password.encode(), user["pw_hash"])
+
+    pw_hash = store.cached_hash(username) if store is not None else None
+    return bool(pw_hash) and bcrypt.checkpw(password.encode(), pw_hash)
+
+def delete_account(users_col, sessions_col, username, store=None):
+    if users_col is None or sessions_col is None:
+        raise ConnectionError("Deleting an account needs a connection to the cloud database")
+
+    # Local data first: drop the cached hash and sessions that were never uploaded, so the
+    # sync worker can't upload them again once the cloud copy is gone
+    if store is not None:
+        store.forget_user(username)
 
-def delete_account(users_col, sessions_col, username):
     # Delete user credentials
     users_col.delete_one({"username": username})
 
-    # Delete user session data
-    sessions_col.delete_many({"username": username})
\ No newline at end of file
+    # Delete user session data, and the rollups the dashboard's trends and fleet views read
+    sessions_col.delete_many({"username": username})
+    sessions_col.database["session_rollups"].delete_many({"username": username})
+    sessions_col.database["fleet_rollups"].delete_many({"username": username})
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+
+import telemetry
+
+
+# =========================
+# 📊 Per-stage counters
+# =========================
+class StageStats:
+    '''rolling FPS / latency counters for one stage of the monitoring pipeline'''
+
+    def __init__(self, window=120):
+        self.samples = deque(maxlen=window)  # (finished_at, latency_seconds)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency, finished_at=None):
+        with self.lock:
+            self.samples.append((finished_at or time.perf_counter(), latency))
+            self.total += 1
+
+    def snapshot(self):
+        with self.lock:
+            samples = list(self.samples)
+            total = self.total
+        if len(samples) < 2:
+            fps = 0.0
+        else:
+            span = samples[-1][0] - samples[0][0]
+            fps = (len(samples) - 1) / span if span > 0 else 0.0
+        avg_ms = sum(lat for _, lat in samples) / len(samples) * 1000 if samples else 0.0
+        max_ms = max(lat for _, lat in samples) * 1000 if samples else 0.0
+        return {"fps": fps, "avg_latency_ms": avg_ms, "max_latency_ms": max_ms, "count": total}
+
+
+# =========================
+# 🖼️ Latest-frame slot
+# =========================
+class LatestFrameSlot:
+    '''bounded frame buffer that drops the oldest frame when full.
+    with the default maxsize of 1 the consumer always gets the freshest frame.'''
+
+    def __init__(self, maxsize=1):
+        self.frames = deque(maxlen=max(1, maxsize))
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame, captured_at):
+        with self.cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append((frame, captured_at))
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        '''returns (frame, captured_at), or None once the slot is closed and drained / on timeout'''
+        with self.cond:
+            if not self.frames and not self.closed:
+                self.cond.wait(timeout)
+            if not self.frames:
+                return None
+            return self.frames.popleft()
+
+    def depth(self):
+        with self.cond:
+            return len(self.frames)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+# =========================
+# 🎥 Capture stage
+# =========================
+class CaptureThread(threading.Thread):
+    '''reads frames from a cv2.VideoCapture as fast as the camera delivers them,
+    independently of how long inference takes'''
+
+    def __init__(self, cap, slot, clock=time.monotonic):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.slot = slot
+        self.clock = clock  # stamps frames, must match the trackers' clock
+        self.stats = StageStats()
+        self.running = False
+        self.ended = False  # camera stopped delivering frames
+
+    def run(self):
+        self.running = True
+        read_seconds = telemetry.get().histogram("driver_monitor_stage_seconds", stage="capture")
+        try:
+            while self.running:
+                t0 = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    self.ended = True
+                    break
+                t1 = time.perf_counter()
+                self.stats.record(t1 - t0, t1)
+                read_seconds.observe(t1 - t0)
+                self.slot.put(frame, self.clock())
+        finally:
+            self.slot.close()
+
+    def stop(self):
+        self.running = False
@@ -1,11 +1,13 @@
 from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout, QMessageBox
 from auth_utils import sign_in, delete_account
+from ui_tasks import submit
 
 class DeleteAccountWindow(QDialog):
-    def __init__(self, users_col, sessions_col):
+    def __init__(self, users_col, sessions_col, store):
         super().__init__()
         self.users_col = users_col
         self.sessions_col = sessions_col
+        self.store = store
         self.setWindowTitle("Delete Account")
         self.setFixedSize(300, 200)
 
@@ -25,18 +27,30 @@ class DeleteAccountWindow(QDialog):
         user = self.username_input.text().strip()
         pwd  = self.password_input.text().strip()
 
-        if sign_in(self.users_col, user, pwd):
-            reply = QMessageBox.question(
-                self, "Confirm Deletion",
-                f"Are you sure you want to permanently delete '{user}'?",
-                QMessageBox.Yes | QMessageBox.No
-            )
-            if reply == QMessageBox.Yes:
-                try:
-                    delete_account(self.users_col, self.sessions_col, user)
-                    QMessageBox.information(self, "Deleted", f"Account '{user}' has been removed.")
-                    self.accept()
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Failed to delete account: {e}")
+        self.delete_btn.setEnabled(False)
+        submit(sign_in, self.users_col, user, pwd, self.store,
+               on_result=lambda ok: self.credentials_checked(user, ok), on_error=self.delete_failed)
+
+    def credentials_checked(self, user, ok):
+        if not ok:
+            self.delete_btn.setEnabled(True)
+            QMessageBox.warning(self, "Invalid Credentials", "Username or password is incorrect.")
+            return
+        reply = QMessageBox.question(
+            self, "Confirm Deletion",
+            f"Are you sure you want to permanently delete '{user}'?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            submit(delete_account, self.users_col, self.sessions_col, user, self.store,
+                   on_result=lambda _: self.deleted(user), on_error=self.delete_failed)
         else:
-            QMessageBox.warning(self, "Invalid Credentials", "Username or password is incorrect.")
\ No newline at end of file
+            self.delete_btn.setEnabled(True)
+
+    def deleted(self, user):
+        QMessageBox.information(self, "Deleted", f"Account '{user}' has been removed.")
+        self.accept()
+
+    def delete_failed(self, error):
+        self.delete_btn.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Failed to delete account: {error}")
\ No newline at end of file
@@ -0,0 +1,139 @@
+'''temporal filtering of detections: per-class confidence smoothing with hysteresis,
+feeding explicit eye and mouth state machines.
+
+a single noisy frame no longer flips the eye state (and with it the closure timer);
+a class has to be seen confidently for a short while to switch on, and has to fade
+below a lower threshold to switch off again.'''
+import math
+
+import numpy as np
+
+# (resting class, alert class) pairs that become an explicit two-state machine
+PAIRS = {
+    "eyes": ("eye_open", "eye_closed"),
+    "mouth": ("no_yawn", "yawn"),
+}
+
+
+def parse_class_thresholds(spec):
+    '''"yawn=0.5/0.3,head_dropped=0.6/0.4" -> {"yawn": (0.5, 0.3), ...}'''
+    out = {}
+    for item in filter(None, (s.strip() for s in (spec or "").split(","))):
+        name, _, pair = item.partition("=")
+        on, _, off = pair.partition("/")
+        out[name.strip()] = (float(on), float(off or on))
+    return out
+
+
+# =========================
+# 📉 Confidence filter
+# =========================
+class ConfidenceFilter:
+    '''exponential smoothing of every class's confidence at once, with a time constant
+    rather than a per-frame factor so the smoothing doesn't change with the frame rate,
+    then per-class hysteresis: on at >= on, off at <= off'''
+
+    def __init__(self, on, off, tau=0.08):
+        self.on = np.asarray(on, dtype=np.float32)
+        self.off = np.asarray(off, dtype=np.float32)
+        self.tau = tau
+        self.reset()
+
+    def reset(self):
+        self.ema = np.zeros_like(self.on)
+        self.active = np.zeros(self.on.shape, dtype=bool)
+        self.last = None
+
+    def update(self, conf, now):
+        if self.last is None or self.tau <= 0:
+            alpha = 1.0
+        else:
+            alpha = 1.0 - math.exp(-max(now - self.last, 0.0) / self.tau)
+        self.last = now
+        self.ema += alpha * (conf - self.ema)
+        self.active = np.where(self.active, self.ema > self.off, self.ema >= self.on)
+        return self.active
+
+
+# =========================
+# 🔀 State machines
+# =========================
+class PairStateMachine:
+    '''two explicit states for a pair of opposing classes. enters the alert state when
+    the alert class is active and clearly ahead of the resting class; leaves it when
+    the alert class switches off or the resting class takes over. holds its state
+    while neither class is visible.
+
+    once the alert state has lasted longer than a blink (SETTLED_AFTER), leaving it
+    must persist for `release` seconds: at low frame rates one stray frame is as long
+    as a blink, and it must not end a prolonged closure.'''
+
+    SETTLED_AFTER = 0.5
+
+    def __init__(self, rest, alert, rest_id, alert_id, margin=0.05, release=0.3):
+        self.rest, self.alert = rest, alert
+        self.rest_id, self.alert_id = rest_id, alert_id
+        self.margin = margin
+        self.release = release
+        self.reset()
+
+    def reset(self):
+        self.state = self.rest
+        self.entered = None
+        self.leaving_since = None
+        self.transitions = 0
+
+    def update(self, ema, active, now):
+        alert_ema, rest_ema = ema[self.alert_id], ema[self.rest_id]
+        if self.state == self.rest:
+            if active[self.alert_id] and alert_ema > rest_ema + self.margin:
+                self.state, self.entered, self.leaving_since = self.alert, now, None
+                self.transitions += 1
+        elif not active[self.alert_id] or rest_ema > alert_ema + self.margin:
+            if self.leaving_since is None:
+                self.leaving_since = now
+            settled = self.leaving_since - self.entered >= self.SETTLED_AFTER
+            if not settled or now - self.leaving_since >= self.release:
+                self.state = self.rest
+                self.transitions += 1
+        else:
+            self.leaving_since = None
+        return self.state
+
+
+class DetectionFilter:
+    '''per-frame feature vector (postprocess.ClassTable) -> the class set the trackers
+    consume, filtered over time. paired classes come out as exactly one of each pair
+    (the machine's state), any other class when its smoothed confidence is switched on.'''
+
+    def __init__(self, table, on=0.35, off=0.2, tau=0.08, margin=0.05, release=0.3, class_thresholds=None):
+        self.features = table.features
+        n = table.size
+        ons, offs = np.full(n, on, dtype=np.float32), np.full(n, off, dtype=np.float32)
+        for nm, (c_on, c_off) in (class_thresholds or {}).items():
+            if nm in table.slot_of:
+                ons[table.slot_of[nm]], offs[table.slot_of[nm]] = c_on, c_off
+        self.filter = ConfidenceFilter(ons, offs, tau)
+
+        self.machines = {}
+        paired = set()
+        for key, (rest, alert) in PAIRS.items():
+            rest_id, alert_id = table.slot_of[rest], table.slot_of[alert]
+            self.machines[key] = PairStateMachine(rest, alert, rest_id, alert_id, margin, release)
+            paired.update((rest_id, alert_id))
+        self.free_ids = np.array([i for i in range(n) if i not in paired], dtype=np.intp)
+
+    def reset(self):
+        self.filter.reset()
+        for m in self.machines.values():
+            m.reset()
+
+    def __call__(self, features, now):
+        active = self.filter.update(features, now)
+        classes = {self.features[i] for i in self.free_ids[active[self.free_ids]]}
+        for m in self.machines.values():
+            classes.add(m.update(self.filter.ema, active, now))
+        return classes
+
+    def states(self):
+        return {key: m.state for key, m in self.machines.items()}
@@ -0,0 +1,194 @@
+'''inference backends for the drowsiness detector.
+
+the trained PyTorch weights can be run as-is or exported once to ONNX
+(onnxruntime, CPU) or OpenVINO (optionally INT8-quantised); the exported
+copy sits next to the .pt file and is reused on later runs.
+
+    python detector_backends.py --weights best.pt --backends torch onnx openvino_int8
+'''
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino", "openvino_int8")
+DEFAULT_TRAIN_DIR = os.path.join("yolo11_runs", "content", "runs", "detect", "train")
+
+
+def _module_available(name):
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def pick_backend(requested="auto"):
+    '''"auto" prefers the fastest CPU runtime that is installed'''
+    if requested != "auto":
+        return requested
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "torch"
+    except ImportError:
+        pass
+    if _module_available("openvino"):
+        return "openvino"
+    if _module_available("onnxruntime"):
+        return "onnx"
+    return "torch"
+
+
+def export_weights(weights, backend, imgsz=640, int8_data=None):
+    '''returns the path of the exported model for backend, exporting on first use'''
+    if backend == "torch":
+        return weights
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        target = f"{stem}.onnx"
+    elif backend == "openvino":
+        target = f"{stem}_openvino_model"
+    elif backend == "openvino_int8":
+        target = f"{stem}_int8_openvino_model"
+    else:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {BACKENDS}")
+    if os.path.exists(target):
+        return target
+
+    from ultralytics import YOLO
+    print(f"[INFO] Exporting {weights} for {backend} (one-time)...")
+    model = YOLO(weights)
+    if backend == "onnx":
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+    elif backend == "openvino":
+        exported = model.export(format="openvino", imgsz=imgsz)
+    else:
+        kwargs = {"data": int8_data} if int8_data else {}
+        exported = model.export(format="openvino", imgsz=imgsz, int8=True, **kwargs)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    return target
+
+
+# =========================
+# 🔍 Detector
+# =========================
+class Detector:
+    '''callable like the ultralytics model it wraps (returns the same Results list),
+    with the backend and input size fixed at construction. exports are static-shape
+    (batch 1, imgsz), so only the torch backend honours a per-call imgsz or runs a list
+    of frames as one batch; the others run at imgsz, one frame at a time.'''
+
+    def __init__(self, weights, backend="auto", imgsz=640, int8_data=None):
+        from ultralytics import YOLO
+        self.backend = pick_backend(backend)
+        self.imgsz = imgsz
+        self.path = export_weights(weights, self.backend, imgsz, int8_data)
+        self.model = YOLO(self.path, task="detect")
+        self.names = self.model.names
+        self.fixed_imgsz = self.backend != "torch"
+
+    def __call__(self, frame, **kwargs):
+        if self.fixed_imgsz:
+            kwargs["imgsz"] = self.imgsz  # a 640 export fails on any other input shape
+        kwargs.setdefault("imgsz", self.imgsz)
+        kwargs.setdefault("verbose", False)
+        if self.fixed_imgsz and isinstance(frame, list) and len(frame) > 1:
+            return [r for f in frame for r in self.model(f, **kwargs)]
+        return self.model(frame, **kwargs)
+
+
+# =========================
+# ⚖️ Export / compare
+# =========================
+def _box_iou(a, b):
+    x1, y1 = np.maximum(a[:, None, 0], b[None, :, 0]), np.maximum(a[:, None, 1], b[None, :, 1])
+    x2, y2 = np.minimum(a[:, None, 2], b[None, :, 2]), np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def _agreement(ref, other):
+    '''fraction of reference boxes matched (same class, IoU >= 0.5) and whether the class sets agree'''
+    rb, ob = ref.boxes, other.boxes
+    ref_cls = rb.cls.cpu().numpy().astype(int)
+    oth_cls = ob.cls.cpu().numpy().astype(int)
+    same_classes = set(ref_cls) == set(oth_cls)
+    if len(ref_cls) == 0:
+        return (1.0 if len(oth_cls) == 0 else 0.0), same_classes
+    if len(oth_cls) == 0:
+        return 0.0, same_classes
+    iou = _box_iou(rb.xyxy.cpu().numpy(), ob.xyxy.cpu().numpy())
+    iou[ref_cls[:, None] != oth_cls[None, :]] = 0
+    return float((iou.max(axis=1) >= 0.5).mean()), same_classes
+
+
+def compare_backends(weights, images, backends, imgsz=640, runs=20, int8_data=None):
+    import cv2
+    frames = [cv2.imread(p) for p in images]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        raise ValueError("No readable images to compare on")
+
+    report = {"weights": weights, "imgsz": imgsz, "images": len(frames), "backends": {}}
+    reference = None
+    for backend in backends:
+        try:
+            det = Detector(weights, backend, imgsz, int8_data)
+        except Exception as e:
+            report["backends"][backend] = {"error": str(e)}
+            continue
+        det(frames[0])  # warm-up
+        latencies = []
+        outputs = []
+        for i in range(max(runs, len(frames))):
+            frame = frames[i % len(frames)]
+            t0 = time.perf_counter()
+            res = det(frame)[0]
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if i < len(frames):
+                outputs.append(res)
+        lat = np.array(latencies)
+        entry = {
+            "model_path": det.path,
+            "mean_ms": float(lat.mean()),
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "fps": float(1000 / lat.mean()),
+        }
+        if reference is None:
+            reference = (backend, outputs)
+        else:
+            pairs = [_agreement(r, o) for r, o in zip(reference[1], outputs)]
+            entry["agreement_vs"] = reference[0]
+            entry["box_match_rate"] = float(np.mean([p[0] for p in pairs]))
+            entry["class_set_agreement"] = float(np.mean([p[1] for p in pairs]))
+        report["backends"][backend] = entry
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=os.path.join(DEFAULT_TRAIN_DIR, "weights", "best.pt"))
+    parser.add_argument("--images", nargs="*", help="images to run on (default: the validation mosaics of the training run)")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS,
+                        help="the first one is the reference for detection agreement")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--int8-data", help="dataset yaml used to calibrate INT8 quantisation")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    images = args.images or sorted(glob.glob(os.path.join(DEFAULT_TRAIN_DIR, "val_batch*_labels.jpg")))
+    result = compare_backends(args.weights, images, args.backends, args.imgsz, args.runs, args.int8_data)
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
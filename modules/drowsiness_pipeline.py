@@ -0,0 +1,96 @@
+import time
+
+import test_driver_drowsiness_detector_module as monitor
+from capture_pipeline import StageStats
+from postprocess import class_table
+
+
+class FrameOutcome:
+    __slots__ = ("state", "msg", "sound", "classes", "features", "results", "blink_count", "avg_blink_duration",
+                 "total_eye_closure_duration", "yawn_count")
+
+    def __init__(self, state, msg, sound, classes, features, results, blink_count, avg_blink_duration,
+                 total_eye_closure_duration, yawn_count):
+        self.state = state
+        self.msg = msg
+        self.sound = sound
+        self.classes = classes
+        self.features = features  # per-class max confidence, slots in postprocess.ClassTable order
+        self.results = results
+        self.blink_count = blink_count
+        self.avg_blink_duration = avg_blink_duration
+        self.total_eye_closure_duration = total_eye_closure_duration
+        self.yawn_count = yawn_count
+
+    def metrics_row(self, ts, reroute="None"):
+        return [ts, self.blink_count, self.avg_blink_duration,
+                self.total_eye_closure_duration, self.yawn_count, self.state, reroute]
+
+
+# =========================
+# 🔁 Detection -> trackers -> state
+# =========================
+class DrowsinessPipeline:
+    '''one driver's frame-to-decision path, shared by live monitoring and offline replay.
+    frames must be stamped with the same clock the trackers use.'''
+
+    STAGES = ("inference", "postprocess", "tracking", "evaluate")
+
+    def __init__(self, detect, clock=time.monotonic):
+        self.detect = detect
+        self.table = None  # class id -> feature slot, built from the model's names on the first frame
+        self.filter = None
+        self.blink_tracker = monitor.BlinkTracker(clock=clock)
+        self.yawn_tracker = monitor.YawnTracker(clock=clock)
+        self.stage_stats = {s: StageStats() for s in self.STAGES}
+        self.last_timings = dict.fromkeys(self.STAGES, 0.0)
+        tel = monitor.get_telemetry()
+        self.histograms = {s: tel.histogram("driver_monitor_stage_seconds", "per-frame latency of each pipeline stage",
+                                            stage=s) for s in self.STAGES}
+
+    def _mark(self, stage, t0):
+        t1 = time.perf_counter()
+        self.stage_stats[stage].record(t1 - t0, t1)
+        self.last_timings[stage] = t1 - t0
+        self.histograms[stage].observe(t1 - t0)
+        return t1
+
+    def process(self, frame, captured_at):
+        '''runs one frame through the pipeline; detector errors propagate to the caller'''
+        t = time.perf_counter()
+        results = self.detect(frame)
+        self._mark("inference", t)
+        return self.process_results(results, captured_at)
+
+    def process_results(self, results, captured_at):
+        '''everything after inference, for callers that batch detection themselves'''
+        t = time.perf_counter()
+        if self.table is None:
+            self.table = class_table(results[0].names)
+            self.filter = monitor.make_detection_filter(self.table)
+        features = self.table(results)
+        classes = self.filter(features, captured_at) if self.filter else self.table.classes(features)
+        t = self._mark("postprocess", t)
+
+        self.blink_tracker.update(classes, captured_at)
+        self.yawn_tracker.update(classes, captured_at)
+        blink_count, avg_blink_duration, total_eye_closure_duration = self.blink_tracker.get_stats()
+        yawn_count = self.yawn_tracker.get_stats()
+        t = self._mark("tracking", t)
+
+        state, (msg, sound) = monitor.evaluate_driver_state(
+            blink_count, avg_blink_duration,
+            total_eye_closure_duration, yawn_count, classes
+        )
+        self._mark("evaluate", t)
+        return FrameOutcome(state, msg, sound, classes, features, results, blink_count, avg_blink_duration,
+                            total_eye_closure_duration, yawn_count)
+
+    def reset(self):
+        self.blink_tracker.reset()
+        self.yawn_tracker.reset()
+        if self.filter:
+            self.filter.reset()  # smoothed confidences / pair states from before the alert
+
+    def stats(self):
+        return {s: st.snapshot() for s, st in self.stage_stats.items()}
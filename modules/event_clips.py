@@ -0,0 +1,291 @@
+'''pre-event video evidence: the last few seconds of camera frames, kept JPEG-compressed
+in a ring with a hard memory cap, written out as a clip plus a detection sidecar
+whenever an alert fires.
+
+the inference thread only hands over a reference to the frame it already has;
+downscaling and JPEG encoding happen on the ring's encoder thread, and clips are
+written by a separate writer thread.
+
+    python event_clips.py --bench --seconds 10 --fps 10     # steady-state memory and encode cost
+'''
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import telemetry
+from capture_pipeline import LatestFrameSlot, StageStats
+from postprocess import frame_boxes
+
+
+class ClipFrame:
+    __slots__ = ("captured_at", "wall_time", "jpeg", "detections", "state")
+
+    def __init__(self, captured_at, wall_time, jpeg, detections, state):
+        self.captured_at = captured_at
+        self.wall_time = wall_time
+        self.jpeg = jpeg  # encoded bytes
+        self.detections = detections  # [[name, conf, x1, y1, x2, y2], ...] in clip pixels
+        self.state = state
+
+
+# =========================
+# 🔁 Ring buffer
+# =========================
+class FrameRing(threading.Thread):
+    '''keeps at most `seconds` of frames sampled at `fps`, and never more than
+    max_bytes of JPEG data: the oldest frames are evicted first on either limit.
+    besides the ring itself, one raw frame at most is held (waiting to be encoded).'''
+
+    def __init__(self, seconds=10.0, fps=10.0, max_bytes=24 * 1024 * 1024, width=480, quality=70):
+        super().__init__(daemon=True)
+        self.seconds = seconds
+        self.period = 1.0 / fps if fps > 0 else 0.0
+        self.max_bytes = max_bytes
+        self.width = width
+        self.quality = quality
+        self.inbox = LatestFrameSlot(1)  # newest raw frame; an encoder that falls behind drops, never queues
+        self.frames = deque()
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.evicted_for_memory = 0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+        self.pushed = threading.Condition(self.lock)  # notified whenever a frame enters the ring
+        self.encode_stats = StageStats()
+        self.encode_seconds = telemetry.get().histogram("driver_monitor_stage_seconds", stage="clip_encode")
+
+    def offer(self, frame, captured_at, results=None, offset=(0, 0), state=None, force=False):
+        '''inference thread: keeps references to the frame and its Results if one is due (or
+        force); boxes are extracted and the frame encoded on the ring's thread'''
+        if captured_at < self.next_at and not force:
+            return False
+        self.next_at = captured_at + self.period
+        self.inbox.put((frame, results, offset, state, time.time()), captured_at)
+        return True
+
+    def run(self):
+        while True:
+            item = self.inbox.get(timeout=1.0)
+            if item is None:
+                if self.inbox.closed:
+                    return
+                continue
+            (frame, results, offset, state, wall_time), captured_at = item
+            t0 = time.perf_counter()
+            clip_frame = self._encode(frame, results, offset, state, captured_at, wall_time)
+            t1 = time.perf_counter()
+            self.encode_stats.record(t1 - t0, t1)
+            self.encode_seconds.observe(t1 - t0)
+            if clip_frame is not None:
+                self._push(clip_frame)
+
+    def _encode(self, frame, results, offset, state, captured_at, wall_time):
+        h, w = frame.shape[:2]
+        scale = 1.0
+        if self.width and w > self.width:
+            scale = self.width / w
+            frame = cv2.resize(frame, (self.width, int(round(h * scale))), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return None
+        detections = []
+        if results is not None:
+            names = results[0].names
+            for x1, y1, x2, y2, conf, cls in frame_boxes(results, offset):
+                detections.append([names.get(int(cls), str(int(cls))), round(float(conf), 3),
+                                   *(round(float(v) * scale, 1) for v in (x1, y1, x2, y2))])
+        return ClipFrame(captured_at, wall_time, jpeg.tobytes(), detections, state)
+
+    def _push(self, clip_frame):
+        with self.lock:
+            self.frames.append(clip_frame)
+            self.bytes += len(clip_frame.jpeg)
+            horizon = clip_frame.captured_at - self.seconds
+            while self.frames and self.frames[0].captured_at < horizon:
+                self.bytes -= len(self.frames.popleft().jpeg)
+            while self.bytes > self.max_bytes and len(self.frames) > 1:
+                self.bytes -= len(self.frames.popleft().jpeg)
+                self.evicted_for_memory += 1
+            self.peak_bytes = max(self.peak_bytes, self.bytes)
+            self.pushed.notify_all()
+
+    def wait_for(self, captured_at, timeout):
+        '''waits until a frame captured at or after captured_at is in the ring'''
+        with self.pushed:
+            return self.pushed.wait_for(lambda: self.frames and self.frames[-1].captured_at >= captured_at,
+                                        timeout)
+
+    def snapshot(self):
+        '''frames currently held, oldest first; the bytes are immutable so this is a cheap copy'''
+        with self.lock:
+            return list(self.frames)
+
+    def stop(self):
+        self.inbox.close()
+
+    def stats(self):
+        with self.lock:
+            frames = len(self.frames)
+            span = self.frames[-1].captured_at - self.frames[0].captured_at if frames > 1 else 0.0
+            out = {"frames": frames, "seconds": span, "bytes": self.bytes, "peak_bytes": self.peak_bytes,
+                   "max_bytes": self.max_bytes, "evicted_for_memory": self.evicted_for_memory}
+        out["encode"] = self.encode_stats.snapshot()
+        out["dropped_raw_frames"] = self.inbox.dropped
+        return out
+
+
+# =========================
+# 💾 Clip writer
+# =========================
+def write_clip(path, frames, alert, fps):
+    '''frames -> MJPG .avi (or concatenated .mjpeg if no AVI writer) plus <path>.json'''
+    first = cv2.imdecode(np.frombuffer(frames[0].jpeg, np.uint8), cv2.IMREAD_COLOR)
+    h, w = first.shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    if writer.isOpened():
+        for f in frames:
+            img = first if f is frames[0] else cv2.imdecode(np.frombuffer(f.jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if img.shape[:2] != (h, w):
+                img = cv2.resize(img, (w, h))
+            writer.write(img)
+        writer.release()
+    else:
+        path = os.path.splitext(path)[0] + ".mjpeg"  # plays in ffplay / VLC
+        with open(path, "wb") as fh:
+            for f in frames:
+                fh.write(f.jpeg)
+
+    t_alert = alert["captured_at"]
+    sidecar = {
+        "clip": os.path.basename(path),
+        "alert": {k: v for k, v in alert.items() if k != "captured_at"},
+        "frame_size": [w, h],
+        "frames": [{"t": round(f.captured_at - t_alert, 3), "time": datetime.fromtimestamp(f.wall_time).isoformat(),
+                    "state": f.state, "detections": f.detections} for f in frames],
+    }
+    with open(path + ".json", "w", encoding="utf-8") as fh:
+        json.dump(sidecar, fh)
+    return path
+
+
+class ClipRecorder:
+    '''owns the ring for one session and writes alert clips on a background thread'''
+
+    def __init__(self, clip_dir, session_id, seconds=10.0, fps=10.0, max_bytes=24 * 1024 * 1024, width=480,
+                 quality=70):
+        self.clip_dir = clip_dir
+        self.session_id = session_id
+        self.fps = fps
+        self.ring = FrameRing(seconds, fps, max_bytes, width, quality)
+        self.jobs = queue.Queue()
+        self.saved = []
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.ring.start()
+        self.writer.start()
+
+    def offer(self, frame, captured_at, results=None, offset=(0, 0), state=None, force=False):
+        return self.ring.offer(frame, captured_at, results, offset, state, force)
+
+    def save(self, state, captured_at, **info):
+        '''queues a clip ending at the alert frame (captured_at, which must have been
+        offered); returns the reference to store with the session. the writer thread
+        fills in frames / seconds, and the path if it had to fall back to .mjpeg'''
+        stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(self.clip_dir, f"{self.session_id}_{stamp}_{state.lower()}.avi")
+        alert = dict(info, state=state, session_id=self.session_id, time=datetime.now().isoformat(),
+                     captured_at=captured_at)
+        ref = {"path": path, "sidecar": path + ".json", "state": state, "time": alert["time"],
+               "frames": 0, "seconds": 0.0}
+        self.jobs.put((ref, alert))
+        self.saved.append(ref)
+        return ref
+
+    def _write_loop(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                ref, alert = job
+                self.ring.wait_for(alert["captured_at"], timeout=1.0)  # the alert frame may still be encoding
+                frames = [f for f in self.ring.snapshot() if f.captured_at <= alert["captured_at"]]
+                if not frames:
+                    ref["error"] = "no frames buffered"
+                    continue
+                os.makedirs(self.clip_dir, exist_ok=True)
+                written = write_clip(ref["path"], frames, alert, self.fps)
+                ref.update(path=written, sidecar=written + ".json", frames=len(frames),
+                           seconds=round(frames[-1].captured_at - frames[0].captured_at, 2))
+                print(f"[INFO] Alert clip saved: {written}")
+            except Exception as e:
+                ref["error"] = str(e)
+                print(f"[ERROR] Failed to save alert clip: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def close(self, timeout=2.0):
+        '''stops buffering and waits (up to timeout) for queued clips to be written; a clip
+        still being written after that finishes in the background, unrecorded in the rollup'''
+        self.ring.stop()
+        self.jobs.put(None)
+        self.writer.join(timeout)
+        return not self.writer.is_alive()
+
+    def stats(self):
+        return dict(self.ring.stats(), clips=len(self.saved))
+
+
+# =========================
+# 📏 Benchmark
+# =========================
+def run_bench(seconds, fps, max_mb, width, quality, duration, height=720, frame_width=1280):
+    '''feeds a synthetic camera through the ring for `duration` simulated seconds'''
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 255, (height, frame_width, 3), dtype=np.uint8), (0, 0), 3)
+    ring = FrameRing(seconds, fps, int(max_mb * 1024 * 1024), width, quality)
+    ring.start()
+    offer_cost = StageStats(window=100000)
+    t = 0.0
+    while t < duration:
+        frame = np.roll(base, int(t * 40), axis=1)  # moving content so JPEG sizes stay realistic
+        t0 = time.perf_counter()
+        ring.offer(frame, t)
+        t1 = time.perf_counter()
+        offer_cost.record(t1 - t0, t1)
+        t += 1.0 / 30
+        time.sleep(1.0 / 30 / 4)  # 4x real time, so the encoder keeps up as on a real cab
+    time.sleep(0.2)
+    ring.stop()
+    ring.join(2.0)
+    stats = ring.stats()
+    stats["offer_us"] = offer_cost.snapshot()["avg_latency_ms"] * 1000
+    print(f"[INFO] Ring: {stats['frames']} frames over {stats['seconds']:.1f} s, "
+          f"{stats['bytes'] / 1024:.0f} KiB (peak {stats['peak_bytes'] / 1024:.0f} KiB, cap {max_mb:g} MiB)")
+    print(f"[INFO] Encode {stats['encode']['avg_latency_ms']:.1f} ms/frame on the ring thread, "
+          f"offer {stats['offer_us']:.1f} us/frame on the inference thread")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--max-mb", type=float, default=24.0)
+    parser.add_argument("--width", type=int, default=480)
+    parser.add_argument("--quality", type=int, default=70)
+    parser.add_argument("--duration", type=float, default=30.0, help="simulated seconds of camera input")
+    args = parser.parse_args()
+    if args.bench:
+        print(json.dumps(run_bench(args.seconds, args.fps, args.max_mb, args.width, args.quality, args.duration),
+                         indent=2))
+    else:
+        parser.print_help()
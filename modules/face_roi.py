@@ -0,0 +1,96 @@
+import numpy as np
+
+
+# =========================
+# 🎯 Face ROI tracking
+# =========================
+class FaceROITracker:
+    '''runs the detector on a padded crop around the driver's face instead of the whole frame.
+
+    every detector class (eyes, yawn, head) lies on the face, so the union of the
+    boxes from a full-frame pass localises it. between full passes the region is
+    propagated from the boxes found in the crop (smoothed, with a constant-velocity
+    step), and we fall back to the full frame when the crop stops finding anything
+    confident or every `full_every` frames.
+
+    returns the detector's Results unchanged, so class/confidence consumers don't
+    care which path ran; box coordinates are relative to `offset`.'''
+
+    def __init__(self, detector, full_every=30, pad=0.35, roi_imgsz=320, min_conf=0.35,
+                 smoothing=0.6, min_size=96):
+        self.detector = detector
+        self.full_every = full_every
+        self.pad = pad
+        self.roi_imgsz = roi_imgsz
+        self.min_conf = min_conf
+        self.smoothing = smoothing
+        self.min_size = min_size
+
+        self.roi = None  # float x1, y1, x2, y2 in frame coordinates
+        self.velocity = np.zeros(4)
+        self.since_full = 0
+        self.offset = (0, 0)
+        self.full_frames = 0
+        self.roi_frames = 0
+
+    def reset(self):
+        self.roi = None
+        self.velocity[:] = 0
+        self.since_full = 0
+
+    def _union(self, results):
+        boxes = results[0].boxes
+        if len(boxes) == 0:
+            return None, 0.0
+        conf = boxes.conf.cpu().numpy()
+        keep = conf >= self.min_conf
+        if not keep.any():
+            return None, float(conf.max())
+        xyxy = boxes.xyxy.cpu().numpy()[keep]
+        return np.array([xyxy[:, 0].min(), xyxy[:, 1].min(), xyxy[:, 2].max(), xyxy[:, 3].max()]), float(conf.max())
+
+    def _crop_box(self, h, w):
+        x1, y1, x2, y2 = self.roi + self.velocity
+        bw, bh = max(x2 - x1, self.min_size), max(y2 - y1, self.min_size)
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        half_w, half_h = bw * (0.5 + self.pad), bh * (0.5 + self.pad)
+        return (int(max(0, cx - half_w)), int(max(0, cy - half_h)),
+                int(min(w, cx + half_w)), int(min(h, cy + half_h)))
+
+    def _full(self, frame):
+        self.full_frames += 1
+        self.since_full = 0
+        self.offset = (0, 0)
+        results = self.detector(frame)
+        box, _ = self._union(results)
+        self.velocity[:] = 0
+        self.roi = box
+        return results
+
+    def __call__(self, frame):
+        if self.roi is None or self.since_full >= self.full_every:
+            return self._full(frame)
+
+        h, w = frame.shape[:2]
+        cx1, cy1, cx2, cy2 = self._crop_box(h, w)
+        if cx2 - cx1 < 8 or cy2 - cy1 < 8:
+            return self._full(frame)
+        results = self.detector(frame[cy1:cy2, cx1:cx2], imgsz=self.roi_imgsz)
+        box, best_conf = self._union(results)
+        if box is None:
+            # lost the face (or confidence collapsed), redo this frame on the full image
+            return self._full(frame)
+
+        box += (cx1, cy1, cx1, cy1)
+        new_roi = self.smoothing * box + (1 - self.smoothing) * self.roi
+        self.velocity = new_roi - self.roi
+        self.roi = new_roi
+        self.offset = (cx1, cy1)
+        self.since_full += 1
+        self.roi_frames += 1
+        return results
+
+    def stats(self):
+        total = self.full_frames + self.roi_frames
+        return {"full_frames": self.full_frames, "roi_frames": self.roi_frames,
+                "roi_ratio": self.roi_frames / total if total else 0.0}
@@ -0,0 +1,146 @@
+'''local stand-in for the gomaps Places / Directions API, for running and
+benchmarking the reroute engine offline.
+
+    python fake_maps_server.py --port 8765            # serve
+    python fake_maps_server.py --bench --latency 0.15 # compare old vs new reroute path
+'''
+import argparse
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _distance_m(a, b):
+    # equirectangular approximation is plenty for a fake
+    lat1, lng1 = map(math.radians, a)
+    lat2, lng2 = map(math.radians, b)
+    x = (lng2 - lng1) * math.cos((lat1 + lat2) / 2)
+    return int(math.hypot(x, lat2 - lat1) * 6371000)
+
+
+def _fake_places(origin, place_type, count=8):
+    lat, lng = origin
+    places = []
+    for i in range(count):
+        angle = (i * 47 + len(place_type) * 13) % 360
+        offset = 0.002 * (i + 1)
+        places.append({
+            "name": f"Fake {place_type.replace('_', ' ').title()} #{i + 1}",
+            "place_id": f"{place_type}-{i}",
+            "geometry": {"location": {
+                "lat": round(lat + offset * math.sin(math.radians(angle)), 6),
+                "lng": round(lng + offset * math.cos(math.radians(angle)), 6),
+            }}
+        })
+    return places
+
+
+class FakeMapsHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    request_count = 0
+    count_lock = threading.Lock()
+
+    def do_GET(self):
+        with FakeMapsHandler.count_lock:
+            FakeMapsHandler.request_count += 1
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/maps/api/place/nearbysearch/json":
+            origin = tuple(map(float, q["location"].split(",")))
+            body = {"status": "OK", "results": _fake_places(origin, q.get("type", "place"))}
+        elif url.path == "/maps/api/directions/json":
+            origin = tuple(map(float, q["origin"].split(",")))
+            dest = tuple(map(float, q["destination"].split(",")))
+            meters = int(_distance_m(origin, dest) * 1.3)
+            seconds = int(meters / 11)
+            body = {"status": "OK", "routes": [{"legs": [{
+                "distance": {"value": meters, "text": f"{meters / 1000:.1f} km"},
+                "duration": {"value": seconds, "text": f"{max(1, seconds // 60)} mins"},
+            }]}]}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_server(port=0, latency=0.0):
+    '''starts the server on a daemon thread, returns (server, base_url)'''
+    FakeMapsHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeMapsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_benchmark(latency, rounds):
+    import requests
+    from reroute_engine import GoMapsBackend, RerouteEngine
+
+    server, base_url = start_fake_server(latency=latency)
+    origin = "19.107094,73.066216"
+
+    # the original path: one plain requests.get per call, all sequential
+    def sequential():
+        stops = []
+        for place_type in ("gas_station", "restaurant"):
+            res = requests.get(f"{base_url}/maps/api/place/nearbysearch/json",
+                               params={"location": origin, "rankby": "distance", "type": place_type}).json()
+            stops.extend(res["results"][:4])
+        best = None
+        for stop in stops:
+            loc = stop["geometry"]["location"]
+            res = requests.get(f"{base_url}/maps/api/directions/json",
+                               params={"origin": origin, "destination": f"{loc['lat']},{loc['lng']}"}).json()
+            leg = res["routes"][0]["legs"][0]
+            if best is None or leg["distance"]["value"] < best[1]["distance"]["value"]:
+                best = (stop, leg)
+        return best
+
+    engine = RerouteEngine(GoMapsBackend("fake", base_url=base_url))
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        fn()
+        return (time.perf_counter() - t0) * 1000
+
+    report = {
+        "latency_per_request_ms": latency * 1000,
+        "sequential_ms": sorted(timed(sequential) for _ in range(rounds)),
+        "engine_cold_ms": timed(lambda: engine.find_nearest(origin)),
+        "engine_warm_ms": sorted(timed(lambda: engine.find_nearest(origin)) for _ in range(rounds)),
+        "cache": engine.cache_stats(),
+        "requests_served": FakeMapsHandler.request_count,
+    }
+    server.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated seconds per request")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.bench:
+        print(json.dumps(run_benchmark(args.latency, args.rounds), indent=2))
+    else:
+        server, base_url = start_fake_server(args.port, args.latency)
+        print(f"Fake maps API on {base_url} (set MAPS_BASE_URL to use it)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,82 @@
+import time
+
+ESCALATE_CLASSES = ("eye_closed", "yawn")
+
+
+# =========================
+# ⏱️ Adaptive frame-rate scheduler
+# =========================
+class AdaptiveFrameScheduler:
+    '''paces the inference loop by drowsiness state.
+
+    each state has a (min_fps, max_fps) pair: the loop runs at min_fps while the
+    driver looks alert and jumps to max_fps on the very next frame once an
+    eye_closed / yawn detection shows up, staying there for hold_seconds after the
+    last one. a blink can therefore start at most 1 / min_fps before it is first
+    seen, and everything after that is sampled at full rate.'''
+
+    def __init__(self, rates, hold_seconds=3.0, clock=time.monotonic, sleep=time.sleep,
+                 cpu_clock=time.process_time):
+        self.rates = rates  # state -> (min_fps, max_fps)
+        self.hold_seconds = hold_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.cpu_clock = cpu_clock
+
+        self.state = "NORMAL"
+        self.escalated_until = 0.0
+        self.next_due = 0.0
+        self.last_mark = None  # (wall, cpu) at the previous update
+        self.usage = {}  # "STATE:idle|escalated" -> [frames, wall_seconds, cpu_seconds]
+
+    def escalated(self):
+        return self.clock() < self.escalated_until
+
+    def target_fps(self):
+        min_fps, max_fps = self.rates.get(self.state, self.rates["NORMAL"])
+        return max_fps if self.escalated() else min_fps
+
+    def max_onset_error(self):
+        '''worst-case delay between eyes closing and the first analysed frame that sees it;
+        a blink shorter than this can fall between two idle frames and never be seen'''
+        return 1.0 / self.rates["NORMAL"][0]
+
+    def wait(self):
+        '''sleeps until the next frame is due at the current rate'''
+        delay = self.next_due - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+
+    def update(self, state, classes):
+        '''call once per analysed frame with its outcome; schedules the next frame'''
+        now = self.clock()
+        cpu = self.cpu_clock()
+        if self.last_mark is not None:
+            key = f"{self.state}:{'escalated' if self.escalated() else 'idle'}"
+            entry = self.usage.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += now - self.last_mark[0]
+            entry[2] += cpu - self.last_mark[1]
+        self.last_mark = (now, cpu)
+
+        self.state = state
+        if state != "NORMAL" or any(c in classes for c in ESCALATE_CLASSES):
+            self.escalated_until = now + self.hold_seconds
+        fps = self.target_fps()
+        self.next_due = now + (1.0 / fps if fps > 0 else 0.0)
+
+    def stats(self):
+        out = {}
+        for key, (frames, wall, cpu) in self.usage.items():
+            out[key] = {
+                "frames": frames,
+                "seconds": wall,
+                "effective_fps": frames / wall if wall > 0 else 0.0,
+                "cpu_percent": 100.0 * cpu / wall if wall > 0 else 0.0,
+            }
+        return out
+
+
+def parse_fps_pair(text):
+    lo, hi = (float(v) for v in text.split(","))
+    return lo, hi
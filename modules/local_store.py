@@ -0,0 +1,289 @@
+'''offline-first storage: sessions and credential hashes live in a local SQLite
+file, and SessionSync uploads them to the cloud whenever it is reachable.'''
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from pymongo import UpdateOne
+
+import telemetry
+from session_writer import update_fleet_rollups, bucket_document, write_rollup
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    username  TEXT PRIMARY KEY,
+    pw_hash   BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id    TEXT PRIMARY KEY,
+    username      TEXT NOT NULL,
+    started       TEXT NOT NULL,
+    closed        INTEGER NOT NULL DEFAULT 0,
+    rollup        TEXT,
+    rollup_synced INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    session_id  TEXT NOT NULL,
+    bucket      INTEGER NOT NULL,
+    sealed      INTEGER NOT NULL DEFAULT 0,
+    synced      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, bucket)
+);
+CREATE TABLE IF NOT EXISTS metric_rows (
+    session_id  TEXT NOT NULL,
+    bucket      INTEGER NOT NULL,
+    row         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metric_rows_bucket ON metric_rows (session_id, bucket);
+"""
+
+
+# =========================
+# 🗄️ Local store
+# =========================
+class LocalStore:
+    '''thread-safe wrapper around one SQLite file.
+    a bucket is uploadable once sealed or once its session is closed; sessions a crash
+    left open are closed when the store is opened again.'''
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        with self.db:
+            # nothing is being recorded yet, so anything still open was cut off by a crash
+            self.db.execute("UPDATE sessions SET closed = 1 WHERE closed = 0")
+        self.lock = threading.Lock()
+        self.upload_lock = threading.Lock()  # held by SessionSync for a whole upload cycle
+
+    def _run(self, sql, params=()):
+        with self.lock, self.db:
+            return self.db.execute(sql, params).fetchall()
+
+    # ---- credentials ----
+    def cache_credentials(self, username, pw_hash):
+        self._run("INSERT OR REPLACE INTO credentials VALUES (?, ?)", (username, bytes(pw_hash)))
+
+    def cached_hash(self, username):
+        rows = self._run("SELECT pw_hash FROM credentials WHERE username = ?", (username,))
+        return rows[0][0] if rows else None
+
+    def forget_user(self, username):
+        '''drops the cached hash and any not-yet-uploaded sessions of a deleted account;
+        waits out an upload in flight, so none of them can reach the cloud afterwards'''
+        with self.upload_lock, self.lock, self.db:
+            self.db.execute("DELETE FROM credentials WHERE username = ?", (username,))
+            ids = [r[0] for r in self.db.execute("SELECT session_id FROM sessions WHERE username = ?", (username,))]
+            for sid in ids:
+                self.db.execute("DELETE FROM metric_rows WHERE session_id = ?", (sid,))
+                self.db.execute("DELETE FROM buckets WHERE session_id = ?", (sid,))
+            self.db.execute("DELETE FROM sessions WHERE username = ?", (username,))
+
+    # ---- recording ----
+    def open_session(self, session_id, username, started):
+        self._run("INSERT OR IGNORE INTO sessions (session_id, username, started) VALUES (?, ?, ?)",
+                  (session_id, username, started))
+
+    def add_row(self, session_id, bucket, row):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO buckets (session_id, bucket) VALUES (?, ?)", (session_id, bucket))
+            self.db.execute("INSERT INTO metric_rows VALUES (?, ?, ?)", (session_id, bucket, json.dumps(list(row))))
+
+    def seal_bucket(self, session_id, bucket):
+        self._run("UPDATE buckets SET sealed = 1 WHERE session_id = ? AND bucket = ?", (session_id, bucket))
+
+    def close_session(self, session_id, rollup=None):
+        self._run("UPDATE sessions SET closed = 1, rollup = ? WHERE session_id = ?",
+                  (json.dumps(rollup) if rollup else None, session_id))
+
+    # ---- syncing ----
+    def pending_buckets(self, limit):
+        '''[(username, session_id, started, bucket, rows)] oldest first'''
+        with self.lock:
+            keys = self.db.execute(
+                """SELECT s.username, b.session_id, s.started, b.bucket
+                   FROM buckets b JOIN sessions s ON s.session_id = b.session_id
+                   WHERE b.synced = 0 AND (b.sealed = 1 OR s.closed = 1)
+                   ORDER BY s.started, b.bucket LIMIT ?""",
+                (limit,)).fetchall()
+            out = []
+            for username, sid, started, bucket in keys:
+                rows = [json.loads(r[0]) for r in self.db.execute(
+                    "SELECT row FROM metric_rows WHERE session_id = ? AND bucket = ? ORDER BY rowid", (sid, bucket))]
+                out.append((username, sid, started, bucket, rows))
+        return out
+
+    def mark_synced(self, keys):
+        with self.lock, self.db:
+            for sid, bucket in keys:
+                self.db.execute("UPDATE buckets SET synced = 1 WHERE session_id = ? AND bucket = ?", (sid, bucket))
+                self.db.execute("DELETE FROM metric_rows WHERE session_id = ? AND bucket = ?", (sid, bucket))
+
+    def pending_rollups(self):
+        return [(u, sid, started, json.loads(r)) for u, sid, started, r in self._run(
+            "SELECT username, session_id, started, rollup FROM sessions WHERE rollup IS NOT NULL AND rollup_synced = 0")]
+
+    def mark_rollup_synced(self, session_id):
+        self._run("UPDATE sessions SET rollup_synced = 1 WHERE session_id = ?", (session_id,))
+
+    def unsynced(self, session_id=None):
+        '''buckets (of one session, or all) still waiting for upload'''
+        if session_id is None:
+            return self._run("SELECT COUNT(*) FROM buckets WHERE synced = 0")[0][0]
+        return self._run("SELECT COUNT(*) FROM buckets WHERE synced = 0 AND session_id = ?", (session_id,))[0][0]
+
+    def prune(self):
+        '''forgets closed sessions that are fully in the cloud'''
+        with self.lock, self.db:
+            done = """SELECT session_id FROM sessions s WHERE closed = 1 AND (rollup IS NULL OR rollup_synced = 1)
+                      AND NOT EXISTS (SELECT 1 FROM buckets b WHERE b.session_id = s.session_id AND b.synced = 0)"""
+            self.db.execute(f"DELETE FROM buckets WHERE session_id IN ({done})")
+            self.db.execute(f"DELETE FROM sessions WHERE session_id IN ({done})")
+
+
+# =========================
+# ☁️ Background sync
+# =========================
+class SessionSync(threading.Thread):
+    '''uploads pending buckets and rollups in batches. bucket documents are upserted
+    on (username, session_id, bucket), so a retried batch never duplicates data.
+    while the cloud is unreachable it retries with jittered exponential backoff.'''
+
+    def __init__(self, store, connect, batch_size=20, retry_min=2.0, retry_max=300.0, idle_interval=60.0):
+        super().__init__(daemon=True)
+        self.store = store
+        self.connect = connect  # () -> (users_col, sessions_col), may raise while offline
+        self.users_col = None
+        self.sessions_col = None
+        self.batch_size = batch_size
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.idle_interval = idle_interval
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.cond = threading.Condition()
+        self.attempts = 0
+        self.last_error = None
+        self.uploaded = 0
+
+    def ensure_connected(self):
+        if self.sessions_col is None:
+            self.users_col, self.sessions_col = self.connect()
+        return self.sessions_col
+
+    def kick(self):
+        self.wake.set()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def run(self):
+        delay = 0.0
+        while not self.stopped.is_set():
+            if delay:
+                self.stopped.wait(delay)  # backing off, kicks don't shorten it
+            else:
+                self.wake.wait(self.idle_interval)
+            self.wake.clear()
+            if self.stopped.is_set():
+                break
+            if self.sync_once():
+                delay = 0.0
+            else:
+                delay = min(self.retry_max, max(self.retry_min, delay * 2)) * random.uniform(0.8, 1.2)
+
+    def sync_once(self):
+        '''uploads everything pending; returns False if the cloud could not be reached'''
+        tel = telemetry.get()
+        upload_seconds = tel.histogram("driver_monitor_db_seconds", "local store writes and cloud uploads",
+                                       op="upload")
+        try:
+            sessions_col = self.ensure_connected()
+            with self.store.upload_lock:
+                while True:
+                    batch = self.store.pending_buckets(self.batch_size)
+                    if not batch:
+                        break
+                    t0 = time.perf_counter()
+                    write_buckets(sessions_col, batch)
+                    upload_seconds.observe(time.perf_counter() - t0)
+                    tel.counter("driver_monitor_buckets_uploaded_total").inc(len(batch))
+                    self.store.mark_synced([(sid, bucket) for _, sid, _, bucket, _ in batch])
+                    self.uploaded += len(batch)
+                for username, sid, started, rollup in self.store.pending_rollups():
+                    write_rollup(sessions_col, username, sid, started, rollup)
+                    self.store.mark_rollup_synced(sid)
+                self.store.prune()
+            ok, self.last_error = True, None
+        except Exception as e:
+            print(f"[WARN] Session sync failed, will retry: {e}")
+            tel.counter("driver_monitor_sync_failures_total").inc()
+            ok, self.last_error = False, e
+        with self.cond:
+            self.attempts += 1
+            self.cond.notify_all()
+        return ok
+
+    def wait_synced(self, session_id, timeout):
+        '''True once the session is fully uploaded; False on timeout or if the next attempt fails'''
+        with self.cond:
+            start = self.attempts
+            return self.cond.wait_for(
+                lambda: not self.store.unsynced(session_id) or (self.attempts > start and self.last_error),
+                timeout
+            ) and not self.store.unsynced(session_id)
+
+
+def write_buckets(sessions_col, batch):
+    '''one bulk upsert for the bucket documents, then the fleet counters per bucket'''
+    sessions_col.bulk_write([
+        UpdateOne({"username": u, "session_id": sid, "bucket": b},
+                  {"$set": bucket_document(started, rows)}, upsert=True)
+        for u, sid, started, b, rows in batch
+    ], ordered=False)
+    for u, sid, _, b, rows in batch:
+        update_fleet_rollups(sessions_col, u, sid, b, rows)
+
+
+def import_wal_dir(store, wal_dir):
+    '''moves write-ahead logs left by earlier versions into the store, returns buckets imported'''
+    import glob
+    imported = 0
+    for path in glob.glob(os.path.join(wal_dir, "*.wal")):
+        try:
+            header, pending = _unacked_buckets(path)
+            if header:
+                store.open_session(header["session_id"], header["username"], header["timestamp"])
+                for bucket, rows in sorted(pending.items()):
+                    for row in rows:
+                        store.add_row(header["session_id"], bucket, row)
+                    imported += 1
+                store.close_session(header["session_id"])
+            os.remove(path)
+        except Exception as e:
+            print(f"[ERROR] Failed to import {os.path.basename(path)}: {e}")
+    return imported
+
+
+def _unacked_buckets(wal_path):
+    header, rows, acked = None, {}, set()
+    with open(wal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                break  # torn write at the tail of a crashed session
+            if rec["type"] == "session":
+                header = rec
+            elif rec["type"] == "row":
+                rows.setdefault(rec["bucket"], []).append(rec["row"])
+            elif rec["type"] == "ack":
+                acked.add(rec["bucket"])
+    return header, {b: r for b, r in rows.items() if b not in acked}
@@ -0,0 +1,69 @@
+import threading
+import time
+
+
+
+# =========================
+# 🧠 Shared model registry
+# =========================
+class ModelRegistry:
+    '''loads each set of weights once per process and warms it up with dummy
+    inferences, so a new monitoring session gets a model that is ready to go'''
+
+    def __init__(self, loader, warmup_runs=1, warmup_shape=(480, 640, 3)):
+        self.loader = loader
+        self.warmup_runs = warmup_runs
+        self.warmup_shape = warmup_shape
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> {"ready": Event, "model": ..., "error": ..., timings}
+
+    def _load(self, key, entry):
+        try:
+            t0 = time.perf_counter()
+            model = self.loader(key)
+            t1 = time.perf_counter()
+            import numpy as np
+            dummy = np.zeros(self.warmup_shape, dtype=np.uint8)
+            for _ in range(self.warmup_runs):
+                model(dummy, verbose=False)
+            t2 = time.perf_counter()
+            entry.update(model=model, load_seconds=t1 - t0, warmup_seconds=t2 - t1)
+            print(f"[INFO] Model ready: loaded in {t1 - t0:.2f}s, warm-up {t2 - t1:.2f}s")
+        except Exception as e:
+            entry["error"] = e
+            print(f"[ERROR] Failed to load model '{key}': {e}")
+        finally:
+            entry["ready"].set()
+
+    def _entry(self, key):
+        '''returns (entry, created)'''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.get("error"):
+                entry = {"ready": threading.Event(), "model": None, "error": None}
+                self.entries[key] = entry
+                return entry, True
+            return entry, False
+
+    def preload(self, key):
+        '''starts loading in the background, a no-op if already loaded or loading'''
+        entry, created = self._entry(key)
+        if created:
+            threading.Thread(target=self._load, args=(key, entry), daemon=True).start()
+
+    def get(self, key, timeout=None):
+        '''returns the warmed-up model, loading it on this thread if nobody started it yet'''
+        entry, created = self._entry(key)
+        if created:
+            self._load(key, entry)
+        if not entry["ready"].wait(timeout):
+            raise TimeoutError(f"Model '{key}' still loading after {timeout}s")
+        if entry["error"]:
+            raise entry["error"]
+        return entry["model"]
+
+    def report(self, key):
+        entry = self.entries.get(key)
+        if not entry or not entry["ready"].is_set() or entry["error"]:
+            return None
+        return {"load_seconds": entry["load_seconds"], "warmup_seconds": entry["warmup_seconds"]}
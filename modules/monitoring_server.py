@@ -0,0 +1,253 @@
+'''multi-stream monitoring server: many video sources, one model, batched inference.
+
+frames from every active stream are gathered on a fixed cadence and sent to the
+detector as a single batch; each stream keeps its own trackers and drowsiness state.
+the server always runs the torch backend (DETECTOR_BACKEND is ignored here): the
+ONNX / OpenVINO exports are static batch-1 and can't take a batch.
+
+    python monitoring_server.py rtsp://cab1/stream cab2.mp4 0     # serve until Ctrl-C
+    python monitoring_server.py --bench --streams 1 4 16 32       # scaling report (synthetic streams)
+'''
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+import test_driver_drowsiness_detector_module as monitor
+from capture_pipeline import CaptureThread, LatestFrameSlot, StageStats
+from drowsiness_pipeline import DrowsinessPipeline
+
+
+# =========================
+# 📡 Sources
+# =========================
+class SyntheticCapture:
+    '''stand-in camera producing noise frames at a fixed rate, cv2.VideoCapture compatible'''
+
+    def __init__(self, width=640, height=480, fps=30.0, seed=0):
+        self.period = 1.0 / fps
+        rng = np.random.default_rng(seed)
+        self.frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+        self.index = 0
+        self.next_at = time.monotonic()
+
+    def read(self):
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at = max(self.next_at + self.period, time.monotonic())
+        self.index += 1
+        return True, self.frames[self.index % len(self.frames)]
+
+    def release(self):
+        pass
+
+
+class PacedCapture:
+    '''plays a video file at its own frame rate instead of as fast as it decodes'''
+
+    def __init__(self, cap, fps):
+        self.cap = cap
+        self.period = 1.0 / (fps or 30.0)
+        self.next_at = time.monotonic()
+
+    def read(self):
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at += self.period
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+def open_capture(spec):
+    '''"synthetic", a camera index, a stream URL or a video file'''
+    if spec == "synthetic":
+        return SyntheticCapture()
+    import cv2
+    if spec.isdigit():
+        return cv2.VideoCapture(int(spec))
+    cap = cv2.VideoCapture(spec)
+    if "://" in spec:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+    return PacedCapture(cap, cap.get(cv2.CAP_PROP_FPS))
+
+
+class Stream:
+    def __init__(self, stream_id, cap):
+        self.stream_id = stream_id
+        self.cap = cap
+        self.slot = LatestFrameSlot(1)
+        self.capture = CaptureThread(cap, self.slot)
+        self.pipeline = DrowsinessPipeline(detect=None)
+        self.latency = StageStats(window=600)  # capture -> decision
+        self.state = "NORMAL"
+
+    def latency_percentiles(self):
+        with self.latency.lock:
+            lat = np.array([l for _, l in self.latency.samples]) * 1000
+        if not len(lat):
+            return None
+        return {"p50": float(np.percentile(lat, 50)), "p95": float(np.percentile(lat, 95)),
+                "max": float(lat.max()), "frames": self.latency.total}
+
+
+# =========================
+# 🏭 Server
+# =========================
+class MonitoringServer:
+    '''on every tick takes the newest frame of each stream, runs them through the
+    detector as one batch and hands each stream its own Results'''
+
+    def __init__(self, detector, cadence_fps=15.0, max_batch=32, on_alert=None):
+        self.detector = detector
+        self.period = 1.0 / cadence_fps
+        self.max_batch = max_batch
+        self.on_alert = on_alert
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.batch_stats = StageStats(window=600)
+        self.batched_frames = 0
+        self.frames_processed = 0
+        self.started_at = None
+
+    def add_stream(self, stream_id, cap):
+        stream = Stream(stream_id, cap)
+        with self.lock:
+            self.streams[stream_id] = stream
+        stream.capture.start()
+        return stream
+
+    def remove_stream(self, stream_id):
+        with self.lock:
+            stream = self.streams.pop(stream_id, None)
+        if stream:
+            stream.capture.stop()
+            stream.capture.join(timeout=2.0)
+            stream.cap.release()
+
+    def start(self):
+        self.running = True
+        self.started_at = time.perf_counter()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        for stream_id in list(self.streams):
+            self.remove_stream(stream_id)
+
+    def _gather(self):
+        with self.lock:
+            streams = list(self.streams.values())
+        batch = []
+        for stream in streams:
+            if stream.slot.closed:
+                continue
+            item = stream.slot.get(timeout=0)
+            if item:
+                batch.append((stream, item[0], item[1]))
+        return batch
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        while self.running:
+            batch = self._gather()
+            for i in range(0, len(batch), self.max_batch):
+                self._run_batch(batch[i:i + self.max_batch])
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # overloaded, don't try to catch up
+
+    def _run_batch(self, batch):
+        t0 = time.perf_counter()
+        try:
+            results = self.detector([frame for _, frame, _ in batch])
+        except Exception as e:
+            print(f"[ERROR] Batch inference failed: {e}")
+            return
+        t1 = time.perf_counter()
+        self.batch_stats.record(t1 - t0, t1)
+        self.batched_frames += len(batch)
+        for (stream, _, captured_at), res in zip(batch, results):
+            out = stream.pipeline.process_results([res], captured_at)
+            stream.latency.record(time.monotonic() - captured_at)
+            stream.state = out.state
+            self.frames_processed += 1
+            if out.state != "NORMAL":
+                if self.on_alert:
+                    self.on_alert(stream.stream_id, out)
+                stream.pipeline.reset()
+
+    def report(self):
+        wall = time.perf_counter() - self.started_at if self.started_at else 0.0
+        with self.lock:
+            streams = dict(self.streams)
+        return {
+            "streams": len(streams),
+            "aggregate_fps": self.frames_processed / wall if wall > 0 else 0.0,
+            "batch_inference": self.batch_stats.snapshot(),
+            "mean_batch_size": self.batched_frames / self.batch_stats.total if self.batch_stats.total else 0.0,
+            "per_stream_latency_ms": {sid: s.latency_percentiles() for sid, s in streams.items()},
+        }
+
+
+def run_scaling_bench(detector, stream_counts, seconds, cadence_fps, source):
+    reports = []
+    for n in stream_counts:
+        server = MonitoringServer(detector, cadence_fps)
+        for i in range(n):
+            server.add_stream(f"stream-{i}", SyntheticCapture(seed=i) if source == "synthetic" else open_capture(source))
+        server.start()
+        time.sleep(seconds)
+        rep = server.report()
+        server.stop()
+        lat = [v for v in rep.pop("per_stream_latency_ms").values() if v]
+        rep["latency_ms_p50_median"] = float(np.median([v["p50"] for v in lat])) if lat else None
+        rep["latency_ms_p95_worst"] = max(v["p95"] for v in lat) if lat else None
+        rep["per_stream_fps"] = rep["aggregate_fps"] / n
+        reports.append(rep)
+        print(f"[INFO] {n} streams: {rep['aggregate_fps']:.1f} fps total, "
+              f"p95 latency {rep['latency_ms_p95_worst'] or 0:.0f} ms")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", help='camera index, stream URL, video file or "synthetic"')
+    parser.add_argument("--cadence", type=float, default=15.0, help="batches per second")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each bench step")
+    parser.add_argument("--bench-source", default="synthetic")
+    args = parser.parse_args()
+
+    detector = monitor.get_batch_model()
+    if args.bench:
+        print(json.dumps(run_scaling_bench(detector, args.streams, args.seconds, args.cadence, args.bench_source), indent=2))
+    else:
+        def alert(stream_id, out):
+            print(f"[ALERT] {stream_id}: {out.state} (closure {out.total_eye_closure_duration:.1f}s, yawns {out.yawn_count})")
+
+        server = MonitoringServer(detector, args.cadence, on_alert=alert)
+        for i, spec in enumerate(args.sources or ["synthetic"]):
+            server.add_stream(f"{i}:{spec}", open_capture(spec))
+        server.start()
+        try:
+            while True:
+                time.sleep(10)
+                print(json.dumps(server.report(), indent=2))
+        except KeyboardInterrupt:
+            server.stop()
@@ -1,153 +1,296 @@
-from PyQt5.QtWidgets import QDialog, QPushButton, QVBoxLayout, QMessageBox
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import QDialog, QLabel, QPushButton, QVBoxLayout, QMessageBox
+from PyQt5.QtCore import QThread, QTimer, Qt, pyqtSignal
 import cv2, time, pandas as pd
 from datetime import datetime
-from ultralytics import YOLO
 import test_driver_drowsiness_detector_module as monitor
-from PyQt5.QtWidgets import QApplication
+from capture_pipeline import CaptureThread, LatestFrameSlot, StageStats
+from session_writer import SessionWriter
+from drowsiness_pipeline import DrowsinessPipeline
+from alert_events import AlertBus, PromptPolicy, PromptReply, REROUTE, DISMISS, TIMEOUT
+from preview import PreviewFrame, PreviewThrottle, PreviewWidget
+from postprocess import frame_boxes
 
 
 
 class MonitoringThread(QThread):
+    MAX_CONSECUTIVE_ERRORS = 30  # detector failures in a row before the session is ended
+
     update_status = pyqtSignal(str)
+    stage_stats = pyqtSignal(dict)
     session_complete = pyqtSignal(pd.DataFrame)
+    preview_frame = pyqtSignal(object)
 
-    def __init__(self, username, sessions_col):
+    def __init__(self, username, sync, bus):
         super().__init__()
         self.username = username
-        self.sessions_col = sessions_col
+        self.sync = sync
+        self.bus = bus
         self.running = False
+        self.capture = None
+        self.frame_slot = None
+        self.pipeline = None
+        self.frame_age_stats = StageStats()  # capture -> decision latency
+        self.first_frame_ms = None  # session start -> first analysed frame
+        self.alert_resume_stats = StageStats()  # alert raised -> next analysed frame
+        self.preview = PreviewThrottle(monitor.PREVIEW_FPS)
+        self.preview_stats = StageStats()  # worker-side cost of each preview frame sent
+        self.detect = None
+        self.scheduler = None
+        self.clips = None
+
+    def get_stage_stats(self):
+        stats = self.pipeline.stats() if self.pipeline else {}
+        stats["frame_age"] = self.frame_age_stats.snapshot()
+        if self.capture:
+            stats["capture"] = self.capture.stats.snapshot()
+        if self.frame_slot:
+            stats["dropped_frames"] = self.frame_slot.dropped
+        if self.scheduler:
+            stats["scheduler"] = self.scheduler.stats()
+        stats["alert_resume"] = self.alert_resume_stats.snapshot()
+        stats["preview"] = dict(self.preview_stats.snapshot(), skipped_busy=self.preview.skipped_busy)
+        if self.clips:
+            stats["clip_buffer"] = self.clips.stats()
+        if hasattr(self.detect, "stats"):
+            stats["face_roi"] = self.detect.stats()
+        stats["startup"] = dict(monitor.model_load_report() or {}, first_frame_ms=self.first_frame_ms)
+        return stats
 
     def run(self):
         self.running = True
+        run_started = time.perf_counter()
         session_id = f"session_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
-        model = YOLO(monitor.resource_path("path _for_model_weights"))
+        try:
+            model = monitor.get_model()  # shared, already warmed up if preloaded at login
+        except Exception as e:
+            self.update_status.emit(f"[ERROR] Could not load detection model: {e}")
+            return
+        detect = self.detect = monitor.make_frame_detector(model)
         cap = cv2.VideoCapture(0)
-        blink_tracker = monitor.BlinkTracker()
-        yawn_tracker = monitor.YawnTracker()
-        df = pd.DataFrame(columns=[
-            "timestamp", "blink_count", "avg_blink_duration",
-            "total_eye_closure_duration", "yawn_count",
-            "drowsiness_state", "reroute_triggered"
-        ])
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # don't let the driver queue up stale frames
+        self.frame_slot = LatestFrameSlot(monitor.FRAME_QUEUE_SIZE)
+        self.capture = CaptureThread(cap, self.frame_slot)
+        self.capture.start()
+        pipeline = self.pipeline = DrowsinessPipeline(detect)
+        writer = SessionWriter(self.sync, self.username, session_id, monitor.SESSION_BUCKET_SECONDS)
+        clips = self.clips = monitor.make_clip_recorder(session_id)
         last_collect_time = time.time()
         state = "NORMAL"
+        scheduler = self.scheduler = monitor.make_frame_scheduler()
+        self.bus.drain_replies()  # late answers to the previous session's prompts
+        prompts = PromptPolicy(self.bus, monitor.PROMPT_TIMEOUT_SECONDS, monitor.PROMPT_MAX_ESCALATIONS)
+        prompt_row = None
+        alert_raised_at = None
+        last_status = None
+        error_streak = 0
+
+        # all no-ops unless METRICS_PORT / METRICS_LOG_PATH is set
+        tel = monitor.get_telemetry()
+        frame_age = tel.histogram("driver_monitor_frame_age_seconds", "capture to decision latency")
+        alert_seconds = tel.histogram("driver_monitor_stage_seconds", stage="alert")
+        preview_seconds = tel.histogram("driver_monitor_stage_seconds", stage="preview")
+        append_seconds = tel.histogram("driver_monitor_db_seconds", "local store writes and cloud uploads",
+                                       op="append")
+        frames = {s: tel.counter("driver_monitor_frames_total", "analysed frames by resulting state", state=s)
+                  for s in ("NORMAL", "MODERATE", "STRONG")}
+        frame_errors = tel.counter("driver_monitor_frame_errors_total", "frames the detector failed on")
+        alerts = {lvl: tel.counter("driver_monitor_alerts_total", "alerts raised", level=lvl)
+                  for lvl in ("moderate", "escalated", "strong")}
+        slot, capture = self.frame_slot, self.capture
+        # session gauges, dropped again when the session ends so a scrape never reports a dead one
+        gauges = [
+            tel.collect("driver_monitor_dropped_frames_total", lambda: slot.dropped, "counter",
+                        "frames the capture stage replaced before inference took them"),
+            tel.collect("driver_monitor_queue_depth", slot.depth, help="items waiting in a queue", queue="frames"),
+            tel.collect("driver_monitor_queue_depth", self.bus.replies.qsize, queue="prompt_replies"),
+            tel.collect("driver_monitor_model_fps", lambda: pipeline.stage_stats["inference"].snapshot()["fps"],
+                        help="frames through the detector per second"),
+            tel.collect("driver_monitor_capture_fps", lambda: capture.stats.snapshot()["fps"],
+                        help="frames delivered by the camera per second"),
+            tel.collect("driver_monitor_target_fps", scheduler.target_fps,
+                        help="inference rate the scheduler aims for"),
+        ]
+        if clips:
+            gauges.append(tel.collect("driver_monitor_clip_buffer_bytes", lambda: clips.ring.bytes,
+                                      help="JPEG bytes held by the pre-event clip ring"))
+        try:
+            def append_row(row):
+                t0 = time.perf_counter()
+                writer.append(row)
+                append_seconds.observe(time.perf_counter() - t0)
+
+            while self.running:
+                scheduler.wait()  # slows down while the driver looks alert
+                item = self.frame_slot.get(timeout=1.0)
+                if item is None:
+                    if self.frame_slot.closed: break  # camera stopped delivering frames
+                    continue
+                frame, captured_at = item
+                try:
+                    out = pipeline.process(frame, captured_at)
+                except Exception as e:
+                    frame_errors.inc()
+                    error_streak += 1
+                    if error_streak == 1:
+                        print(f"[ERROR] Detection failed on a frame: {e}")
+                    if error_streak >= self.MAX_CONSECUTIVE_ERRORS:
+                        self.update_status.emit(f"[ERROR] Detection failed on {error_streak} frames in a row, "
+                                                f"monitoring stopped: {e}")
+                        break
+                    continue
+                if error_streak:
+                    print(f"[INFO] Detection recovered after {error_streak} failed frames")
+                    error_streak = 0
+                state, msg, sound, classes = out.state, out.msg, out.sound, out.classes
+                frames[state].inc()
 
-        while self.running:
-            ret, frame = cap.read()
-            if not ret: break
-            try:
-                results = model(frame)
-            except Exception: continue
-
-            eye_conf = {"eye_open": 0.0, "eye_closed": 0.0}
-            classes = set()
-            for box in results[0].boxes:
-                cid = int(box.cls[0].item())
-                conf = box.conf[0].item()
-                nm = results[0].names[cid]
-                if nm in eye_conf:
-                    eye_conf[nm] = max(eye_conf[nm], conf)
-                else:
-                    classes.add(nm)
-            if eye_conf["eye_closed"] or eye_conf["eye_open"]:
-                dominant_eye = max(eye_conf, key=eye_conf.get)
-                classes.add(dominant_eye)
-
-            blink_tracker.update(classes)
-            yawn_tracker.update(classes)
-            blink_count, avg_blink_duration, total_eye_closure_duration = blink_tracker.get_stats()
-            yawn_count = yawn_tracker.get_stats()
-
-            state, (msg, sound) = monitor.evaluate_driver_state(
-                blink_count, avg_blink_duration,
-                total_eye_closure_duration, yawn_count, classes
-            )
-            self.update_status.emit(f"[STATE: {state}] {msg}")
-
-            now = time.time()
-            if now - last_collect_time >= 1.0:
-                ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                df.loc[len(df)] = [ts, blink_count, avg_blink_duration,
-                    total_eye_closure_duration, yawn_count, state, "None"]
-                last_collect_time = now
-
-            if state == "STRONG":
-                cap.release()
-                monitor.play_sound(sound)
-
-                monitor.reroute_to_nearest_stop()
-                time.sleep(5)  # Give browser time to launch before logging and exiting
-
-                ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                df.loc[len(df)] = [ts, blink_count, avg_blink_duration,
-                    total_eye_closure_duration, yawn_count, state, "Yes"]
-                
-                break
-
-            elif state == "MODERATE":
-                # cap.release()
-                monitor.play_sound(sound)
-                app = QApplication.instance()
-                user_choice = QMessageBox.question(
-                    app.activeWindow() or app.focusWidget(),
-                    "Moderate Drowsiness",
-                    "Reroute to rest stop?",
-                    QMessageBox.Yes | QMessageBox.No
-                )
-                ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                df.loc[len(df)] = [ts, blink_count, avg_blink_duration,
-                    total_eye_closure_duration, yawn_count, state,
-                    "Yes" if user_choice == QMessageBox.Yes else "No"]
-                if user_choice == QMessageBox.Yes:
-                    monitor.reroute_to_nearest_stop()
-                    time.sleep(5)
+                scheduler.update(state, classes)
+                status = f"[STATE: {state}] {msg}"
+                if status != last_status:  # only on changes, not once per frame
+                    self.update_status.emit(status)
+                    last_status = status
+                if self.first_frame_ms is None:
+                    self.first_frame_ms = (time.perf_counter() - run_started) * 1000
+
+                age = time.monotonic() - captured_at
+                self.frame_age_stats.record(age)
+                frame_age.observe(age)
+                if clips:
+                    # the frame that saves a clip always goes in, so the clip ends on it;
+                    # MODERATE frames while the prompt is open keep to CLIP_FPS
+                    saves_clip = state == "STRONG" or (state == "MODERATE" and prompts.open is None)
+                    clips.offer(frame, captured_at, out.results, getattr(detect, "offset", (0, 0)), state,
+                                force=saves_clip)
+                if self.preview.due():
+                    # the frame itself is handed over as is; only the boxes are materialised
+                    t0 = time.perf_counter()
+                    roi = getattr(detect, "roi", None)
+                    self.preview_frame.emit(PreviewFrame(
+                        frame, frame_boxes(out.results, getattr(detect, "offset", (0, 0))), out.results[0].names,
+                        None if roi is None else tuple(roi), state))
+                    t1 = time.perf_counter()
+                    self.preview_stats.record(t1 - t0, t1)
+                    preview_seconds.observe(t1 - t0)
+                if alert_raised_at is not None:
+                    self.alert_resume_stats.record(time.perf_counter() - alert_raised_at)
+                    alert_raised_at = None
+                now = time.time()
+                if now - last_collect_time >= 1.0:
+                    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    append_row(out.metrics_row(ts, "None"))
+                    last_collect_time = now
+                    self.stage_stats.emit(self.get_stage_stats())
+                    if state == "NORMAL":
+                        monitor.prefetch_reroute()
+
+                t_alert = time.perf_counter()
+                if state == "STRONG":
+                    alerts["strong"].inc()
+                    if clips:
+                        writer.add_clip(clips.save("STRONG", captured_at, msg=msg.strip()))
+                    prompts.close()
+                    self.capture.stop()
+                    monitor.play_sound(sound)
+
+                    monitor.reroute_to_nearest_stop_async()
+
+                    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    append_row(out.metrics_row(ts, "Yes"))
+                    alert_seconds.observe(time.perf_counter() - t_alert)
                     break
-                else:
-                    blink_tracker.reset()
-                    yawn_tracker.reset()
+
+                elif state == "MODERATE":
+                    # the GUI prompts the driver, detection carries on while they decide
+                    event = prompts.moderate(msg, sound)
+                    if event:
+                        alerts["moderate"].inc()
+                        if clips:
+                            writer.add_clip(clips.save("MODERATE", captured_at, msg=msg.strip(),
+                                                       alert_id=event.alert_id))
+                        monitor.play_sound(sound)
+                        # the MODERATE row is written when the driver answers, with the readings that raised it
+                        prompt_row = out.metrics_row(None)
+                        pipeline.reset()
+                        last_collect_time = time.time()
+                        state = "NORMAL"
+                        alert_raised_at = time.perf_counter()
+
+                action, event = prompts.poll()
+                if action == "escalate":
+                    alerts["escalated"].inc()
+                    monitor.play_sound(event.sound)
+                    alert_raised_at = time.perf_counter()
+                elif action is not None:
+                    prompt_row[0] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    prompt_row[6] = "Yes" if action == REROUTE else "No"
+                    append_row(prompt_row)
+                    prompt_row = None
+                    if action == REROUTE:
+                        monitor.reroute_to_nearest_stop_async()
+                        alert_seconds.observe(time.perf_counter() - t_alert)
+                        break
+                    pipeline.reset()
                     last_collect_time = time.time()
-                    state = "NORMAL"
+                alert_seconds.observe(time.perf_counter() - t_alert)
 
-            # annotated = results[0].plot()
-            # cv2.imshow("Driver Monitor", annotated)
-            # if cv2.waitKey(1) & 0xFF == ord('q'):
-            #     break
+                # annotated = results[0].plot()
+                # cv2.imshow("Driver Monitor", annotated)
+                # if cv2.waitKey(1) & 0xFF == ord('q'):
+                #     break
 
-        cap.release()
-        # cv2.destroyAllWindows()
-        self.log_session_to_db(session_id, df)
-        self.session_complete.emit(df)
+            if prompt_row is not None:  # session ended with the prompt unanswered
+                prompt_row[0] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                append_row(prompt_row)
+            prompts.close()
+            self.capture.stop()
+            self.capture.join(timeout=2.0)
+            cap.release()
+            if clips and not clips.close():
+                print("[WARN] Alert clips still being written when the session closed")
+            # cv2.destroyAllWindows()
+            self.log_session_to_db(writer)
+            self.session_complete.emit(writer.to_dataframe())
+        finally:
+            for handle in gauges:
+                tel.uncollect(handle)
 
     def stop(self):
         self.running = False
 
-    def log_session_to_db(self, session_id, df):
+    def log_session_to_db(self, writer):
+        # buckets have been syncing all along, this seals the last one
         try:
-            metrics_list = df.to_dict(orient="records")
-            session_entry = {
-                "username": self.username,
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat(),
-                "metrics": metrics_list
-            }
-            self.sessions_col.insert_one(session_entry)
+            if not writer.close():
+                print(f"[WARN] Session {writer.session_id} saved locally, will upload once the cloud is reachable")
         except Exception as e:
             print(f"[ERROR] Failed to save session: {e}")
 
 class MonitoringWindow(QDialog):
-    def __init__(self, username, sessions_col):
+    def __init__(self, username, sync):
         super().__init__()
         self.username = username
-        self.sessions_col = sessions_col
+        self.sync = sync
         self.setWindowTitle(f"Monitoring Panel ({username})")
-        self.setFixedSize(300, 200)
+        monitor.get_telemetry()  # metrics endpoint / log, when configured, is up for the whole panel
 
         self.start_btn = QPushButton("Start Monitoring")
         self.stop_btn = QPushButton("Stop Monitoring")
         self.stop_btn.setEnabled(False)
+        self.status_label = QLabel("")
+        self.timings_label = QLabel("")
+        self.timings_label.setStyleSheet("color: gray; font-size: 11px;")
 
         layout = QVBoxLayout(self)
+        self.preview = None
+        if monitor.PREVIEW_FPS > 0:
+            # lets drivers and installers check camera placement
+            self.preview = PreviewWidget(self)
+            layout.addWidget(self.preview, 1)
+            self.resize(560, 540)
+        else:
+            self.setFixedSize(300, 200)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.timings_label)
         layout.addWidget(self.start_btn)
         layout.addWidget(self.stop_btn)
 
@@ -155,26 +298,93 @@ class MonitoringWindow(QDialog):
         self.stop_btn.clicked.connect(self.stop_monitoring)
 
         self.monitor_thread = None
+        self.prompt = None  # (alert_id, QMessageBox) while the driver is being asked
+        self.bus = AlertBus()
+        self.bus.alert_raised.connect(self.show_prompt)
+        self.bus.alert_cleared.connect(self.close_prompt)
+        monitor.get_alert_player()  # init the mixer and decode alert clips before monitoring starts
 
     def start_monitoring(self):
-        self.monitor_thread = MonitoringThread(self.username, self.sessions_col)
+        self.monitor_thread = MonitoringThread(self.username, self.sync, self.bus)
+        self.monitor_thread.finished.connect(self.monitoring_finished)
         self.monitor_thread.update_status.connect(self.show_status)
         self.monitor_thread.session_complete.connect(self.session_done)
+        self.monitor_thread.stage_stats.connect(self.show_stats)
+        if self.preview:
+            self.preview.throttle = self.monitor_thread.preview
+            self.monitor_thread.preview_frame.connect(self.preview.show_frame)
         self.monitor_thread.start()
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
 
     def stop_monitoring(self):
+        # the thread finishes the session (last bucket, clips) on its own; the GUI doesn't wait for it
         if self.monitor_thread:
             self.monitor_thread.stop()
-            self.monitor_thread.wait()
-            self.start_btn.setEnabled(True)
             self.stop_btn.setEnabled(False)
 
+    def monitoring_finished(self):
+        self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+
+    def done(self, result):
+        # closing the panel (window button or Esc) ends the session; a QThread must not outlive it
+        if self.monitor_thread and self.monitor_thread.isRunning():
+            self.monitor_thread.stop()
+            self.monitor_thread.wait()
+        super().done(result)
+
     def show_status(self, msg):
-        print(msg)  # Or update a GUI label if you want
+        print(msg)  # the thread only emits when the state or message changes
+        self.status_label.setText(msg)
+
+    def show_stats(self, stats):
+        # once a second: what inference costs next to what the preview costs
+        inference, preview = stats.get("inference", {}), stats.get("preview", {})
+        text = (f"inference {inference.get('avg_latency_ms', 0):.1f} ms @ {inference.get('fps', 0):.1f} fps"
+                f" · preview {preview.get('avg_latency_ms', 0):.2f} ms")
+        if self.preview:
+            text += f" + paint {self.preview.paint_stats.snapshot()['avg_latency_ms']:.2f} ms (GUI thread)"
+        self.timings_label.setText(text)
+
+    def show_prompt(self, event):
+        # non-modal, so the GUI stays live; the answer goes back over the bus
+        self.close_prompt()
+        title = "Moderate Drowsiness" if event.level == 0 else "Are you still alert?"
+        box = QMessageBox(QMessageBox.Warning, title, event.msg.strip(), QMessageBox.Yes | QMessageBox.No, self)
+        box.setWindowModality(Qt.NonModal)
+        deadline = time.monotonic() + event.timeout
+        countdown = QTimer(box)
+
+        def tick():
+            box.setInformativeText(f"Reroute to rest stop? ({max(0, deadline - time.monotonic()):.0f}s)")
+
+        box.buttonClicked.connect(lambda b: self.answer_prompt(
+            event.alert_id, REROUTE if box.standardButton(b) == QMessageBox.Yes else DISMISS))
+        countdown.timeout.connect(tick)
+        countdown.start(1000)
+        tick()
+        expiry = QTimer(box)  # owned by the box, so it dies with an answered prompt
+        expiry.setSingleShot(True)
+        expiry.timeout.connect(lambda: self.answer_prompt(event.alert_id, TIMEOUT))
+        expiry.start(int(event.timeout * 1000))
+        box.show()
+        self.prompt = (event.alert_id, box)
+
+    def answer_prompt(self, alert_id, choice):
+        if self.prompt and self.prompt[0] == alert_id:
+            self.bus.reply(PromptReply(alert_id, choice))
+            self.close_prompt(alert_id)
+
+    def close_prompt(self, alert_id=None):
+        if self.prompt and (alert_id is None or self.prompt[0] == alert_id):
+            box = self.prompt[1]
+            self.prompt = None
+            box.close()
+            box.deleteLater()
 
     def session_done(self, df):
-        QMessageBox.information(self, "Session Complete", "Session metrics saved to cloud.")
-        self.start_btn.setEnabled(True)
-        self.stop_btn.setEnabled(False)
\ No newline at end of file
+        self.close_prompt()
+        if self.preview:
+            self.preview.clear()
+        QMessageBox.information(self, "Session Complete", "Session metrics saved.")
\ No newline at end of file
@@ -0,0 +1,183 @@
+'''vectorised post-processing of detector Results into a fixed-size feature vector:
+the highest confidence per class, in a stable slot order that doesn't depend on
+how the model numbers its classes.
+
+    python postprocess.py --bench                 # loop vs. vectorised on synthetic outputs
+    python postprocess.py --bench --boxes 1 8 64 512 --repeat 2000
+'''
+import argparse
+import json
+import time
+
+import numpy as np
+
+# slots every model gets in this order; classes a model adds beyond these follow them
+FEATURES = ("eye_open", "eye_closed", "no_yawn", "yawn", "head_dropped")
+
+
+class ClassTable:
+    '''model class id -> feature slot, computed once per model'''
+
+    def __init__(self, names):
+        names = dict(names)
+        self.features = list(FEATURES) + [nm for _, nm in sorted(names.items()) if nm not in FEATURES]
+        self.slot_of = {nm: i for i, nm in enumerate(self.features)}
+        self.lut = np.full(max(names) + 1, -1, dtype=np.intp)
+        for cid, nm in names.items():
+            self.lut[cid] = self.slot_of[nm]
+        self.size = len(self.features)
+        self._slots = np.arange(self.size)
+
+    def features_from_arrays(self, cls, conf):
+        '''per-slot max confidence from class-id / confidence arrays of one frame'''
+        out = np.zeros(self.size, dtype=np.float32)
+        if len(cls):
+            slots = self.lut[cls.astype(np.intp)]
+            # boxes x slots mask, one max over the box axis; a handful of slots keeps this tiny
+            out = np.where(slots[:, None] == self._slots, conf[:, None], 0.0).max(axis=0).astype(np.float32)
+        return out
+
+    def __call__(self, results):
+        '''Results -> feature vector, with a single device -> host transfer of the boxes'''
+        boxes = results[0].boxes
+        if len(boxes) == 0:
+            return np.zeros(self.size, dtype=np.float32)
+        arr = boxes.data.cpu().numpy()  # x1, y1, x2, y2, [track id,] conf, cls
+        return self.features_from_arrays(arr[:, -1], arr[:, -2])
+
+    def classes(self, vec):
+        '''feature vector -> class set, keeping only the more confident eye state (the
+        unfiltered path, used when DETECTION_FILTER is off)'''
+        present = {self.features[i] for i in np.flatnonzero(vec)}
+        open_c, closed_c = vec[self.slot_of["eye_open"]], vec[self.slot_of["eye_closed"]]
+        present.discard("eye_open")
+        present.discard("eye_closed")
+        if open_c or closed_c:
+            present.add("eye_closed" if closed_c > open_c else "eye_open")
+        return present
+
+
+_tables = {}
+
+def class_table(names):
+    '''shared table per model class list'''
+    key = tuple(sorted(dict(names).items()))
+    if key not in _tables:
+        _tables[key] = ClassTable(names)
+    return _tables[key]
+
+
+def frame_boxes(results, offset=(0, 0)):
+    '''N x 6 float32 detections (x1, y1, x2, y2, conf, cls) in frame coordinates, for
+    drawing and clip sidecars; face-ROI boxes come relative to the crop at `offset`'''
+    boxes = results[0].boxes
+    if len(boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    arr = boxes.data.cpu().numpy()  # x1, y1, x2, y2, [track id,] conf, cls
+    out = np.empty((len(arr), 6), dtype=np.float32)
+    out[:, :4] = arr[:, :4]
+    out[:, [0, 2]] += offset[0]
+    out[:, [1, 3]] += offset[1]
+    out[:, 4], out[:, 5] = arr[:, -2], arr[:, -1]
+    return out
+
+
+# =========================
+# 📏 Micro-benchmarks
+# =========================
+def _synthetic_results(n_boxes, names, rng):
+    '''Results-like object with n_boxes random detections; torch tensors when available'''
+    data = np.zeros((n_boxes, 6), dtype=np.float32)
+    data[:, :4] = rng.uniform(0, 640, (n_boxes, 4))
+    data[:, 4] = rng.uniform(0.25, 1.0, n_boxes)
+    data[:, 5] = rng.integers(0, len(names), n_boxes)
+    try:
+        import torch
+        from ultralytics.engine.results import Boxes
+        boxes = Boxes(torch.from_numpy(data), (640, 640))
+    except ImportError:
+        boxes = _NumpyBoxes(data)
+    return [type("Results", (), {"boxes": boxes, "names": names})()]
+
+
+class _NumpyBoxes:
+    '''stand-in with the ultralytics Boxes surface the two paths use'''
+
+    class _T:
+        def __init__(self, a):
+            self.a = a
+
+        def cpu(self):
+            return self
+
+        def numpy(self):
+            return self.a
+
+        def item(self):
+            return self.a.item()
+
+        def __getitem__(self, i):
+            return _NumpyBoxes._T(self.a[i])
+
+    def __init__(self, data):
+        self.data = self._T(data)
+        self.cls = self._T(data[:, 5])
+        self.conf = self._T(data[:, 4])
+
+    def __len__(self):
+        return len(self.data.a)
+
+    def __iter__(self):
+        for row in self.data.a:
+            yield type("Box", (), {"cls": self._T(row[5:6]), "conf": self._T(row[4:5])})()
+
+
+def extract_classes_loop(results):
+    '''the original per-box loop, kept as the benchmark baseline'''
+    eye_conf = {"eye_open": 0.0, "eye_closed": 0.0}
+    classes = set()
+    for box in results[0].boxes:
+        cid = int(box.cls[0].item())
+        conf = box.conf[0].item()
+        nm = results[0].names[cid]
+        if nm in eye_conf:
+            eye_conf[nm] = max(eye_conf[nm], conf)
+        else:
+            classes.add(nm)
+    if eye_conf["eye_closed"] or eye_conf["eye_open"]:
+        classes.add(max(eye_conf, key=eye_conf.get))
+    return classes
+
+
+def run_bench(box_counts, repeat, seed=0):
+    names = {0: "eye_closed", 1: "eye_open", 2: "no_yawn", 3: "yawn", 4: "head_dropped"}
+    table = class_table(names)
+    rng = np.random.default_rng(seed)
+    report = []
+    for n in box_counts:
+        frames = [_synthetic_results(n, names, rng) for _ in range(16)]
+        for res in frames:  # both paths must agree before timing them
+            assert extract_classes_loop(res) == table.classes(table(res)), "paths disagree"
+        row = {"boxes": n}
+        for label, fn in (("loop_us", extract_classes_loop), ("vectorised_us", lambda r: table.classes(table(r)))):
+            t0 = time.perf_counter()
+            for i in range(repeat):
+                fn(frames[i % len(frames)])
+            row[label] = (time.perf_counter() - t0) / repeat * 1e6
+        row["speedup"] = row["loop_us"] / row["vectorised_us"]
+        report.append(row)
+        print(f"[INFO] {n:5d} boxes: loop {row['loop_us']:9.1f} us, vectorised {row['vectorised_us']:7.1f} us "
+              f"({row['speedup']:.1f}x)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--boxes", type=int, nargs="+", default=[1, 4, 16, 64, 256, 1024])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    if args.bench:
+        print(json.dumps(run_bench(args.boxes, args.repeat), indent=2))
+    else:
+        parser.print_help()
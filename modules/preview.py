@@ -0,0 +1,128 @@
+'''live camera preview for the monitoring window.
+
+the camera frame is wrapped as a QImage over the numpy buffer (no copy, no colour
+conversion: Qt reads BGR directly), detections are painted as rectangles on top,
+and frames reach the GUI at most PREVIEW_FPS times a second, and only once the
+previous one has been painted, so the preview can never back up into inference.'''
+import threading
+import time
+
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen
+from PyQt5.QtWidgets import QSizePolicy, QWidget
+
+import telemetry
+from capture_pipeline import StageStats
+
+ALERT_CLASSES = ("eye_closed", "yawn", "head_dropped")
+
+
+class PreviewFrame:
+    __slots__ = ("image", "boxes", "names", "roi", "state")
+
+    def __init__(self, image, boxes, names, roi, state):
+        self.image = image  # the camera's BGR ndarray, shared, never written to
+        self.boxes = boxes  # N x 6 float32: x1, y1, x2, y2 in frame pixels, conf, cls
+        self.names = names
+        self.roi = roi  # face region the ROI tracker is following, or None
+        self.state = state
+
+
+# =========================
+# 🚦 Rate limit
+# =========================
+class PreviewThrottle:
+    '''worker side: a frame is due when the rate allows and the GUI has painted the last one'''
+
+    def __init__(self, fps, clock=time.monotonic):
+        self.period = 1.0 / fps if fps > 0 else None
+        self.clock = clock
+        self.next_at = 0.0
+        self.idle = threading.Event()
+        self.idle.set()
+        self.skipped_busy = 0  # frames not sent because the GUI was still painting
+
+    def due(self):
+        if self.period is None:
+            return False
+        now = self.clock()
+        if now < self.next_at:
+            return False
+        if not self.idle.is_set():
+            self.skipped_busy += 1
+            return False
+        self.idle.clear()
+        self.next_at = now + self.period
+        return True
+
+    def done(self):
+        '''GUI side, after the frame has been painted (or dropped)'''
+        self.idle.set()
+
+
+# =========================
+# 🖼️ Widget
+# =========================
+class PreviewWidget(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumSize(320, 240)
+        self.frame = None
+        self.image = None
+        self.throttle = None
+        self.paint_stats = StageStats()
+        self.paint_seconds = telemetry.get().histogram("driver_monitor_stage_seconds", stage="preview_paint")
+        self.ok_pen = QPen(QColor(40, 200, 90), 2)
+        self.alert_pen = QPen(QColor(230, 50, 50), 2)
+        self.roi_pen = QPen(QColor(240, 200, 40), 1, Qt.DashLine)
+
+    def show_frame(self, frame):
+        '''slot for the worker's PreviewFrame; keeps the ndarray alive as long as the QImage'''
+        image = frame.image
+        if not self.isVisible() or image.ndim != 3 or image.shape[2] != 3 or not image.flags.c_contiguous:
+            self.frame_done()
+            return
+        h, w = image.shape[:2]
+        self.frame = frame
+        self.image = QImage(image.data, w, h, image.strides[0], QImage.Format_BGR888)
+        self.update()
+
+    def clear(self):
+        self.frame = self.image = None
+        self.update()
+
+    def frame_done(self):
+        if self.throttle:
+            self.throttle.done()
+
+    def paintEvent(self, event):
+        t0 = time.perf_counter()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self.image is None:
+            painter.end()
+            return
+        frame = self.frame
+        h, w = frame.image.shape[:2]
+        scale = min(self.width() / w, self.height() / h)
+        ox, oy = (self.width() - w * scale) / 2, (self.height() - h * scale) / 2
+        painter.drawImage(QRectF(ox, oy, w * scale, h * scale), self.image)
+
+        def rect(x1, y1, x2, y2):
+            return QRectF(ox + x1 * scale, oy + y1 * scale, (x2 - x1) * scale, (y2 - y1) * scale)
+
+        if frame.roi is not None:
+            painter.setPen(self.roi_pen)
+            painter.drawRect(rect(*frame.roi))
+        for x1, y1, x2, y2, conf, cls in frame.boxes:
+            name = frame.names.get(int(cls), str(int(cls)))
+            painter.setPen(self.alert_pen if name in ALERT_CLASSES else self.ok_pen)
+            r = rect(x1, y1, x2, y2)
+            painter.drawRect(r)
+            painter.drawText(QPointF(r.left(), r.top() - 4), f"{name} {conf:.2f}")
+        painter.end()
+        t1 = time.perf_counter()
+        self.paint_stats.record(t1 - t0, t1)
+        self.paint_seconds.observe(t1 - t0)
+        self.frame_done()
@@ -0,0 +1,219 @@
+'''offline replay / benchmark: runs recorded video through the same
+detection -> trackers -> evaluate_driver_state pipeline as live monitoring,
+on a simulated clock, and prints a JSON report.
+
+    python replay.py drive.mp4 --weights best.pt --annotations drive.json --output bench.json
+    python replay.py frames_dir/ --fps 15
+
+annotations are a JSON list of events the replay should alert on:
+    [{"start": 42.0, "expect": "STRONG"}, {"start": 310.5, "expect": "MODERATE"}]
+'''
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import test_driver_drowsiness_detector_module as monitor
+from detector_backends import Detector
+from drowsiness_pipeline import DrowsinessPipeline
+
+SEVERITY = {"NORMAL": 0, "MODERATE": 1, "STRONG": 2}
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+# =========================
+# 🎞️ Frame sources
+# =========================
+class SimulatedClock:
+    '''advanced by the replay to each frame's media time'''
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def video_frames(path):
+    '''yields (frame, media_seconds)'''
+    import cv2
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video '{path}'")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame, index / fps
+            index += 1
+    finally:
+        cap.release()
+
+
+def directory_frames(path, fps):
+    import cv2
+    files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXTS))
+    for index, f in enumerate(files):
+        frame = cv2.imread(f)
+        if frame is not None:
+            yield frame, index / fps
+
+
+def open_source(path, fps=30.0):
+    return directory_frames(path, fps) if os.path.isdir(path) else video_frames(path)
+
+
+# =========================
+# 📏 Replay
+# =========================
+def _percentiles(values_ms):
+    if not values_ms:
+        return None
+    arr = np.asarray(values_ms)
+    return {"p50": float(np.percentile(arr, 50)), "p90": float(np.percentile(arr, 90)),
+            "p99": float(np.percentile(arr, 99)), "max": float(arr.max()), "mean": float(arr.mean())}
+
+
+def _time_to_alert(annotations, alerts):
+    '''for each annotated event, seconds until the first alert at least as severe'''
+    out = []
+    for ev in annotations:
+        need = SEVERITY[ev.get("expect", "STRONG")]
+        hit = next((t for t, state in alerts if t >= ev["start"] and SEVERITY[state] >= need), None)
+        out.append(dict(ev, alerted_at=hit, time_to_alert=None if hit is None else hit - ev["start"]))
+    return out
+
+
+def replay(frames, detect, annotations=()):
+    '''runs every frame through a fresh pipeline and returns the report dict.
+    alerts behave as if the driver declined the reroute: logged, trackers reset, replay continues.'''
+    clock = SimulatedClock()
+    pipeline = DrowsinessPipeline(detect, clock=clock)
+    timings = {s: [] for s in ("decode",) + DrowsinessPipeline.STAGES}
+    state_frames = dict.fromkeys(SEVERITY, 0)
+    alerts = []
+    processed = errors = 0
+    media_seconds = 0.0
+
+    started = time.perf_counter()
+    frames = iter(frames)
+    while True:
+        t0 = time.perf_counter()
+        item = next(frames, None)
+        if item is None:
+            break
+        timings["decode"].append((time.perf_counter() - t0) * 1000)
+        frame, media_seconds = item
+        clock.now = media_seconds
+        try:
+            out = pipeline.process(frame, media_seconds)
+        except Exception as e:
+            errors += 1
+            print(f"[WARN] Frame at {media_seconds:.2f}s failed: {e}", file=sys.stderr)
+            continue
+        for stage in DrowsinessPipeline.STAGES:
+            timings[stage].append(pipeline.last_timings[stage] * 1000)
+        processed += 1
+        state_frames[out.state] += 1
+        if out.state != "NORMAL":
+            alerts.append((media_seconds, out.state))
+            pipeline.reset()
+    wall = time.perf_counter() - started
+
+    return {
+        "frames": processed,
+        "errors": errors,
+        "media_seconds": media_seconds,
+        "wall_seconds": wall,
+        "throughput_fps": processed / wall if wall > 0 else 0.0,
+        "realtime_factor": media_seconds / wall if wall > 0 else 0.0,
+        "latency_ms": {stage: _percentiles(v) for stage, v in timings.items()},
+        "peak_rss_mb": _peak_rss_mb(),
+        "state_frames": state_frames,
+        "alerts": [{"at": t, "state": s} for t, s in alerts],
+        "events": _time_to_alert(annotations, alerts),
+    }
+
+
+def peak_python_memory_mb(frames, detect):
+    '''separate pass under tracemalloc, which slows every allocation, so it never
+    runs inside the timed replay; the pass's own timings are thrown away'''
+    tracemalloc.start()
+    try:
+        replay(frames, detect)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+
+def _version():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=here,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="video file or directory of frames")
+    parser.add_argument("--weights", default=monitor.MODEL_WEIGHTS)
+    parser.add_argument("--backend", default=monitor.DETECTOR_BACKEND)
+    parser.add_argument("--imgsz", type=int, default=monitor.DETECTOR_IMGSZ)
+    parser.add_argument("--no-roi", action="store_true", help="always detect on the full frame")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate of a frames directory")
+    parser.add_argument("--annotations", help="JSON list of {start, expect} events")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="replay a second time under tracemalloc to report peak Python memory")
+    args = parser.parse_args()
+
+    detector = Detector(monitor.resource_path(args.weights), args.backend, args.imgsz)
+    detector(np.zeros((480, 640, 3), dtype=np.uint8))  # warm-up, kept out of the numbers
+    detect = detector if args.no_roi else monitor.make_frame_detector(detector)
+    annotations = []
+    if args.annotations:
+        with open(args.annotations) as f:
+            annotations = json.load(f)
+
+    report = replay(open_source(args.source, args.fps), detect, annotations)
+    if args.trace_memory:
+        report["peak_python_memory_mb"] = peak_python_memory_mb(
+            open_source(args.source, args.fps), detector if args.no_roi else monitor.make_frame_detector(detector))
+    report["run"] = {
+        "source": args.source,
+        "version": _version(),
+        "backend": detector.backend,
+        "imgsz": args.imgsz,
+        "face_roi": not args.no_roi,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if hasattr(detect, "stats"):
+        report["face_roi"] = detect.stats()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
@@ -0,0 +1,252 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# =========================
+# 🌐 Geohash
+# =========================
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(lat, lng, precision=6):
+    '''standard base32 geohash, precision 6 is a ~1.2km x 0.6km cell'''
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    bits, bit_count, even = 0, 0, True
+    out = []
+    while len(out) < precision:
+        rng, val = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if val >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            out.append(_GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(out)
+
+def parse_latlng(loc):
+    lat, lng = loc.split(",")
+    return float(lat), float(lng)
+
+
+# =========================
+# 🗃️ TTL cache
+# =========================
+class TTLCache:
+    def __init__(self, ttl=600, max_entries=256, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.data = {}  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry and entry[0] > self.clock():
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            now = self.clock()
+            if len(self.data) >= self.max_entries:
+                self.data = {k: v for k, v in self.data.items() if v[0] > now}
+                if len(self.data) >= self.max_entries:
+                    del self.data[min(self.data, key=lambda k: self.data[k][0])]
+            self.data[key] = (now + self.ttl, value)
+
+
+# =========================
+# 🗺️ Maps backend
+# =========================
+class GoMapsBackend:
+    '''Places / Directions client over one pooled HTTP session.
+    point base_url at fake_maps_server to run without the real API.'''
+
+    def __init__(self, api_key, base_url="https://maps.gomaps.pro", timeout=(3.05, 5), pool_size=8):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, path, params):
+        params = dict(params, key=self.api_key)
+        res = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    def nearby_search(self, origin_loc, place_type):
+        res = self._get("/maps/api/place/nearbysearch/json", {
+            "location": origin_loc,
+            "rankby": "distance",
+            "type": place_type
+        })
+        return res.get("results", [])
+
+    def directions(self, origin_loc, dest_latlng):
+        res = self._get("/maps/api/directions/json", {
+            "origin": origin_loc,
+            "destination": f"{dest_latlng['lat']},{dest_latlng['lng']}",
+            "mode": "driving"
+        })
+        if "routes" in res and res["routes"]:
+            return res["routes"][0]["legs"][0]
+        return None
+
+
+# =========================
+# 🧭 Reroute engine
+# =========================
+def _log_error(msg):
+    print(f"[ERROR] {msg}")
+
+
+class RerouteEngine:
+    '''finds the nearest refreshment stop by road distance.
+    place and route lookups run concurrently and are cached per origin geohash cell.'''
+
+    def __init__(self, backend, types=("gas_station", "restaurant"), limit=4,
+                 cache_ttl=600, geohash_precision=6, max_workers=8, prefetch_interval=60, prefetch_max_backoff=900):
+        self.backend = backend
+        self.types = types
+        self.limit = limit
+        self.precision = geohash_precision
+        self.places_cache = TTLCache(cache_ttl)
+        self.routes_cache = TTLCache(cache_ttl)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reroute")
+        self.prefetch_lock = threading.Lock()
+        self.prefetching = set()
+        self.prefetch_interval = prefetch_interval
+        self.last_prefetch = {}  # cell -> monotonic time of last prefetch
+        self.prefetch_max_backoff = prefetch_max_backoff
+        self.prefetch_failures = 0  # consecutive failed prefetches (the current outage)
+        self.prefetch_retry_at = 0.0
+
+    def _cell(self, origin_loc):
+        return geohash(*parse_latlng(origin_loc), precision=self.precision)
+
+    def places(self, origin_loc, place_type):
+        '''up to `limit` places of one type near origin_loc, cached per cell'''
+        key = (self._cell(origin_loc), place_type)
+        places = self.places_cache.get(key)
+        if places is None:
+            places = self.backend.nearby_search(origin_loc, place_type)[:self.limit]
+            for place in places:
+                place["place_type"] = place_type
+            self.places_cache.put(key, places)
+        return places
+
+    def route(self, origin_loc, dest_latlng):
+        '''driving route from origin_loc to a {"lat", "lng"} point (or None), cached per cell'''
+        key = (self._cell(origin_loc), round(dest_latlng["lat"], 6), round(dest_latlng["lng"], 6))
+        route = self.routes_cache.get(key)
+        if route is None:
+            route = self.backend.directions(origin_loc, dest_latlng)
+            if route:
+                self.routes_cache.put(key, route)
+        return route
+
+    def find_stops(self, origin_loc, on_error=_log_error):
+        futures = [self.executor.submit(self.places, origin_loc, t) for t in self.types]
+        stops = []
+        for f in futures:
+            try:
+                stops.extend(f.result())
+            except Exception as e:
+                on_error(f"Place lookup failed: {e}")
+        return stops
+
+    def find_nearest(self, origin_loc, on_error=_log_error):
+        '''blocking lookup, returns {"stop": ..., "route": ...} or None; lookup failures
+        are reported through on_error and skipped'''
+        stops = self.find_stops(origin_loc, on_error)
+        futures = [(stop, self.executor.submit(self.route, origin_loc, stop["geometry"]["location"]))
+                   for stop in stops]
+        nearest = None
+        min_dist = float("inf")
+        for stop, f in futures:
+            try:
+                route = f.result()
+            except Exception as e:
+                on_error(f"Route lookup failed for {stop.get('name')}: {e}")
+                continue
+            if route and route["distance"]["value"] < min_dist:
+                min_dist = route["distance"]["value"]
+                nearest = {"stop": stop, "route": route}
+        return nearest
+
+    def reroute_async(self, origin_loc, callback):
+        '''runs find_nearest in the background and hands the result (or None) to callback'''
+        def task():
+            try:
+                result = self.find_nearest(origin_loc)
+            except Exception as e:
+                print(f"[ERROR] Reroute failed: {e}")
+                result = None
+            callback(result)
+        # not on the pool: find_nearest itself blocks on pool workers
+        threading.Thread(target=task, daemon=True).start()
+
+    def prefetch(self, origin_loc):
+        '''warms the caches for origin_loc, a no-op if its cell was prefetched recently or still is.
+        while the maps service is unreachable, retries back off exponentially (up to
+        prefetch_max_backoff) and the outage is logged once, not on every attempt'''
+        cell = self._cell(origin_loc)
+        now = time.monotonic()
+        with self.prefetch_lock:
+            if cell in self.prefetching or now < self.prefetch_retry_at:
+                return
+            if now - self.last_prefetch.get(cell, -self.prefetch_interval) < self.prefetch_interval:
+                return
+            self.prefetching.add(cell)
+            self.last_prefetch[cell] = now
+
+        def task():
+            errors = []
+            try:
+                self.find_nearest(origin_loc, on_error=errors.append)
+            except Exception as e:
+                errors.append(str(e))
+            finally:
+                with self.prefetch_lock:
+                    self.prefetching.discard(cell)
+                    self._prefetch_done(cell, errors)
+        threading.Thread(target=task, daemon=True).start()
+
+    def _prefetch_done(self, cell, errors):
+        '''called with prefetch_lock held'''
+        if errors:
+            self.prefetch_failures += 1
+            delay = min(self.prefetch_interval * 2 ** (self.prefetch_failures - 1), self.prefetch_max_backoff)
+            self.prefetch_retry_at = time.monotonic() + delay
+            self.last_prefetch.pop(cell, None)  # not warmed, so due again once the backoff ends
+            if self.prefetch_failures == 1:
+                print(f"[WARN] Reroute prefetch failed, retrying with backoff until it succeeds: {errors[0]}")
+        elif self.prefetch_failures:
+            print(f"[INFO] Reroute prefetch working again after {self.prefetch_failures} failed attempts")
+            self.prefetch_failures = 0
+            self.prefetch_retry_at = 0.0
+
+    def cache_stats(self):
+        return {
+            "places": {"hits": self.places_cache.hits, "misses": self.places_cache.misses},
+            "routes": {"hits": self.routes_cache.hits, "misses": self.routes_cache.misses},
+        }
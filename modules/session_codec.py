@@ -0,0 +1,202 @@
+'''compact columnar encoding for session metrics.
+
+a bucket of per-second rows is stored as one packed, zlib-compressed array per
+column: epoch timestamps as deltas, counts as ints, durations as float32 and
+drowsiness_state / reroute_triggered as small-int enums. decode_columns() gives
+back the same rows the dashboard always worked with.
+
+columns are fixed-width little-endian (widths recorded in the document), and the
+naive row timestamps are taken as UTC, so a bucket decodes the same on any OS and
+in any timezone it was written in.
+
+    python session_codec.py migrate --dry-run   # report the saving on existing documents
+    python session_codec.py migrate             # rewrite row-format documents in place
+'''
+import argparse
+import calendar
+import struct
+import zlib
+from array import array
+from datetime import datetime, timezone
+
+CODEC = "col2"
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+METRIC_COLUMNS = [
+    "timestamp", "blink_count", "avg_blink_duration",
+    "total_eye_closure_duration", "yawn_count",
+    "drowsiness_state", "reroute_triggered"
+]
+STATES = ["NORMAL", "MODERATE", "STRONG"]
+REROUTES = ["None", "No", "Yes"]
+
+# column -> stored dtype (numpy notation, kept in each document as "dtypes")
+_PACKED = {
+    "dt": "<i4",
+    "blink_count": "<i4",
+    "avg_blink_duration": "<f4",
+    "total_eye_closure_duration": "<f4",
+    "yawn_count": "<i4",
+    "drowsiness_state": "|u1",
+    "reroute_triggered": "|u1",
+}
+_STRUCT = {"<i4": "i", "<f4": "f", "|u1": "B", "<i8": "q"}
+
+# "col1" documents used platform array typecodes: "l" (4 or 8 bytes), "f", "B"
+_LEGACY_PACKED = {"dt": "l", "blink_count": "l", "yawn_count": "l", "avg_blink_duration": "f",
+                  "total_eye_closure_duration": "f", "drowsiness_state": "B", "reroute_triggered": "B"}
+
+
+def _pack(dtype, values, compress):
+    raw = struct.pack(f"<{len(values)}{_STRUCT[dtype]}", *values)
+    return zlib.compress(raw, 6) if compress else raw
+
+
+def _unpack(dtype, blob, compressed, n):
+    raw = zlib.decompress(blob) if compressed else blob
+    return list(struct.unpack(f"<{n}{_STRUCT[dtype]}", raw))
+
+
+def _unpack_legacy(typecode, blob, compressed, n):
+    raw = zlib.decompress(blob) if compressed else blob
+    if typecode == "l" and n:
+        typecode = "q" if len(raw) // n == 8 else "i"  # "l" was 8 bytes on Linux, 4 on Windows
+    out = array(typecode)
+    out.frombytes(raw)
+    return out.tolist()
+
+
+def _epoch(ts):
+    return calendar.timegm(datetime.strptime(ts, TS_FORMAT).timetuple())
+
+
+def encode_metrics(rows, compress=True):
+    '''rows: lists in METRIC_COLUMNS order -> columnar document fragment'''
+    epochs = [_epoch(r[0]) for r in rows]
+    deltas = [e - p for p, e in zip([epochs[0]] + epochs[:-1], epochs)] if epochs else []
+    columns = {
+        "dt": deltas,
+        "blink_count": [int(r[1]) for r in rows],
+        "avg_blink_duration": [float(r[2]) for r in rows],
+        "total_eye_closure_duration": [float(r[3]) for r in rows],
+        "yawn_count": [int(r[4]) for r in rows],
+        "drowsiness_state": [STATES.index(r[5]) if r[5] in STATES else 0 for r in rows],
+        "reroute_triggered": [REROUTES.index(r[6]) if r[6] in REROUTES else 0 for r in rows],
+    }
+    return {
+        "codec": CODEC,
+        "n": len(rows),
+        "t0": epochs[0] if epochs else 0,
+        "compressed": compress,
+        "dtypes": dict(_PACKED),
+        "cols": {c: _pack(_PACKED[c], v, compress) for c, v in columns.items()},
+    }
+
+
+def decode_columns(encoded):
+    '''columnar fragment -> dict of column lists in METRIC_COLUMNS'''
+    n, compressed = encoded["n"], encoded["compressed"]
+    if encoded["codec"] == "col1":
+        cols = {c: _unpack_legacy(t, encoded["cols"][c], compressed, n) for c, t in _LEGACY_PACKED.items()}
+        # col1 epochs came from the writer's local time; decoding in local time is the best guess
+        to_dt = datetime.fromtimestamp
+    else:
+        dtypes = encoded.get("dtypes", _PACKED)
+        cols = {c: _unpack(dtypes[c], encoded["cols"][c], compressed, n) for c in _PACKED}
+        to_dt = lambda e: datetime.fromtimestamp(e, timezone.utc)
+    epoch, stamps = encoded["t0"], []
+    for d in cols["dt"]:
+        epoch += d
+        stamps.append(to_dt(epoch).strftime(TS_FORMAT))
+    return {
+        "timestamp": stamps,
+        "blink_count": cols["blink_count"],
+        "avg_blink_duration": [round(v, 4) for v in cols["avg_blink_duration"]],
+        "total_eye_closure_duration": [round(v, 4) for v in cols["total_eye_closure_duration"]],
+        "yawn_count": cols["yawn_count"],
+        "drowsiness_state": [STATES[v] for v in cols["drowsiness_state"]],
+        "reroute_triggered": [REROUTES[v] for v in cols["reroute_triggered"]],
+    }
+
+
+def bucket_summary(rows):
+    '''per-bucket counters the dashboard aggregates instead of unpacking metrics'''
+    states = [r[5] for r in rows]
+    return {
+        "rows": len(rows),
+        "normal": states.count("NORMAL"),
+        "moderate": states.count("MODERATE"),
+        "strong": states.count("STRONG"),
+        "reroutes": sum(r[6] == "Yes" for r in rows),
+        "max_closure": max((float(r[3]) for r in rows), default=0.0),
+        "blink_sum": sum(int(r[1]) for r in rows),
+        "max_yawn": max((int(r[4]) for r in rows), default=0),
+    }
+
+
+def session_dataframe(docs):
+    '''bucket documents (sorted by bucket) in either format -> the DataFrame get_session_df expects'''
+    import pandas as pd
+    parts = {c: [] for c in METRIC_COLUMNS}
+    for doc in docs:
+        if "metrics_c" in doc:
+            cols = decode_columns(doc["metrics_c"])
+        else:  # row format, not migrated yet
+            cols = {c: [m.get(c) for m in doc.get("metrics", [])] for c in METRIC_COLUMNS}
+        for c in METRIC_COLUMNS:
+            parts[c].extend(cols[c])
+    return pd.DataFrame(parts, columns=METRIC_COLUMNS)
+
+
+# =========================
+# 🔁 Migration
+# =========================
+def _legacy_row(m):
+    '''row-format metric -> encodable row; missing values default to 0 / NORMAL / "None",
+    rows without a usable timestamp are dropped'''
+    try:
+        datetime.strptime(m.get("timestamp") or "", TS_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return [m["timestamp"], int(m.get("blink_count") or 0), float(m.get("avg_blink_duration") or 0.0),
+            float(m.get("total_eye_closure_duration") or 0.0), int(m.get("yawn_count") or 0),
+            m.get("drowsiness_state") or "NORMAL", m.get("reroute_triggered") or "None"]
+
+
+def migrate(sessions_col, dry_run=False, batch_size=200):
+    '''rewrites row-format session documents into the columnar format, returns a size report'''
+    import bson
+    from pymongo import UpdateOne
+
+    report = {"documents": 0, "bytes_before": 0, "bytes_after": 0}
+    ops = []
+    for doc in sessions_col.find({"metrics": {"$exists": True}, "metrics_c": {"$exists": False}}):
+        rows = [r for r in (_legacy_row(m) for m in doc["metrics"]) if r is not None]
+        encoded = encode_metrics(rows)
+        new_doc = {k: v for k, v in doc.items() if k != "metrics"}
+        new_doc.update(metrics_c=encoded, summary=bucket_summary(rows), bucket=doc.get("bucket", 0))
+        report["documents"] += 1
+        report["bytes_before"] += len(bson.encode(doc))
+        report["bytes_after"] += len(bson.encode(new_doc))
+        ops.append(UpdateOne({"_id": doc["_id"]}, {
+            "$set": {"metrics_c": encoded, "summary": new_doc["summary"], "bucket": new_doc["bucket"]},
+            "$unset": {"metrics": ""}
+        }))
+        if len(ops) >= batch_size and not dry_run:
+            sessions_col.bulk_write(ops, ordered=False)
+            ops = []
+    if ops and not dry_run:
+        sessions_col.bulk_write(ops, ordered=False)
+    if report["bytes_after"]:
+        report["ratio"] = report["bytes_before"] / report["bytes_after"]
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--dry-run", action="store_true", help="only report how much space would be saved")
+    args = parser.parse_args()
+
+    from auth_utils import connect_to_cloud_db
+    _, sessions_col = connect_to_cloud_db()
+    print(migrate(sessions_col, dry_run=args.dry_run))
@@ -0,0 +1,173 @@
+import time
+from datetime import datetime
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from session_codec import METRIC_COLUMNS, bucket_summary, encode_metrics
+
+
+
+# =========================
+# 📋 Columnar metrics buffer
+# =========================
+class MetricsBuffer:
+    '''append-only per-column lists, O(1) per row instead of growing a DataFrame'''
+
+    def __init__(self, columns=METRIC_COLUMNS):
+        self.columns = list(columns)
+        self.data = {c: [] for c in self.columns}
+
+    def append(self, row):
+        for c, v in zip(self.columns, row):
+            self.data[c].append(v)
+
+    def __len__(self):
+        return len(self.data[self.columns[0]])
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.data, columns=self.columns)
+
+
+# =========================
+# 💾 Streaming session writer
+# =========================
+class SessionWriter:
+    '''records metric rows for one session in the local store, in buckets of
+    bucket_seconds. sealed buckets are uploaded by the SessionSync worker, so
+    monitoring never waits on (or needs) the network.'''
+
+    def __init__(self, sync, username, session_id, bucket_seconds=60):
+        self.sync = sync
+        self.store = sync.store
+        self.username = username
+        self.session_id = session_id
+        self.bucket_seconds = bucket_seconds
+        self.started = datetime.now().isoformat()
+        self.buffer = MetricsBuffer()
+        self.clips = []  # alert clip references (event_clips.ClipRecorder.save)
+
+        self.bucket = 0
+        self.bucket_size = 0
+        self.bucket_opened = None
+        self.store.open_session(session_id, username, self.started)
+
+    def append(self, row):
+        now = time.monotonic()
+        if self.bucket_opened is None:
+            self.bucket_opened = now
+        elif now - self.bucket_opened >= self.bucket_seconds and self.bucket_size:
+            self._seal_bucket()
+            self.bucket_opened = now
+        self.buffer.append(row)
+        self.store.add_row(self.session_id, self.bucket, row)
+        self.bucket_size += 1
+
+    def _seal_bucket(self):
+        self.store.seal_bucket(self.session_id, self.bucket)
+        self.bucket += 1
+        self.bucket_size = 0
+        self.sync.kick()
+
+    def add_clip(self, ref):
+        if ref:
+            self.clips.append(ref)
+
+    def close(self, timeout=10):
+        '''seals the open bucket and gives the sync worker a chance to upload;
+        returns True if the whole session is already in the cloud. while the last
+        sync attempt failed it doesn't wait: the worker is backing off anyway'''
+        if self.bucket_size:
+            self._seal_bucket()
+        rollup = session_rollup(self.buffer) if len(self.buffer) else None
+        if self.clips:
+            rollup = dict(rollup or {}, clips=self.clips)
+        self.store.close_session(self.session_id, rollup)
+        self.sync.kick()
+        if self.sync.last_error is not None:
+            return False
+        return self.sync.wait_synced(self.session_id, timeout)
+
+    def to_dataframe(self):
+        return self.buffer.to_dataframe()
+
+
+def bucket_document(started, rows):
+    return {
+        "timestamp": started,
+        "bucket_start": rows[0][0],
+        "metrics_c": encode_metrics(rows),
+        "summary": bucket_summary(rows)
+    }
+
+
+# =========================
+# 🚚 Fleet rollups
+# =========================
+_fleet_indexes_ready = False
+
+def update_fleet_rollups(sessions_col, username, session_id, bucket, rows):
+    '''adds a bucket's rows to the per-driver, per-hour counters in fleet_rollups.
+    each bucket is applied at most once, so a replayed bucket isn't double counted.'''
+    global _fleet_indexes_ready
+    fleet = sessions_col.database["fleet_rollups"]
+    if not _fleet_indexes_ready:
+        fleet.create_index([("username", ASCENDING), ("hour", ASCENDING)], unique=True)
+        fleet.create_index([("hour", ASCENDING)])
+        _fleet_indexes_ready = True
+
+    per_hour = {}
+    for r in rows:
+        ts, closure, state, reroute = r[0], r[3], r[5], r[6]
+        h = per_hour.setdefault(ts[:13], {"rows": 0, "strong": 0, "moderate": 0,
+                                          "reroutes": 0, "eye_closure_seconds": 0.0})
+        h["rows"] += 1
+        h["strong"] += state == "STRONG"
+        h["moderate"] += state == "MODERATE"
+        h["reroutes"] += reroute == "Yes"
+        # rows are ~1s apart, so each one adds at most a second of closure
+        h["eye_closure_seconds"] += min(float(closure or 0), 1.0)
+
+    applied = f"{session_id}:{bucket}"
+    for hour, counts in per_hour.items():
+        when = datetime.strptime(hour, "%Y-%m-%d %H")
+        for attempt in range(2):
+            try:
+                fleet.update_one(
+                    {"username": username, "hour": hour, "applied": {"$ne": applied}},
+                    {"$inc": counts, "$push": {"applied": applied},
+                     "$setOnInsert": {"weekday": when.weekday(), "hour_of_day": when.hour}},
+                    upsert=True
+                )
+                break
+            except DuplicateKeyError:
+                # either another writer inserted this hour's document first (the retry then
+                # updates it) or the bucket is already counted (the retry collides again)
+                continue
+
+
+# =========================
+# 📈 Per-session rollup
+# =========================
+def session_rollup(buffer):
+    '''summary the dashboard's long-range trends are built from, so they never read raw metrics'''
+    d = buffer.data
+    states = d["drowsiness_state"]
+    return {
+        "rows": len(buffer),
+        "strong_rows": states.count("STRONG"),
+        "moderate_rows": states.count("MODERATE"),
+        "reroutes": d["reroute_triggered"].count("Yes"),
+        "max_closure": max(d["total_eye_closure_duration"], default=0),
+        "mean_blink_count": sum(d["blink_count"]) / len(buffer),
+        "max_yawn_count": max(d["yawn_count"], default=0),
+    }
+
+def write_rollup(sessions_col, username, session_id, started, rollup):
+    sessions_col.database["session_rollups"].update_one(
+        {"username": username, "session_id": session_id},
+        # takes over from a rollup the dashboard backfilled while the session was still uploading
+        {"$set": dict(rollup, timestamp=started, day=started[:10]), "$unset": {"backfilled": "", "buckets": ""}},
+        upsert=True
+    )
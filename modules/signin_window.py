@@ -1,12 +1,14 @@
 from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout, QMessageBox
 from auth_utils import sign_in
-from monitoring_window import MonitoringWindow  # Add this import
+from ui_tasks import submit
+import test_driver_drowsiness_detector_module as monitor
 
 class SignInWindow(QDialog):
-    def __init__(self, users_col, sessions_col):
+    def __init__(self, users_col, sync):
         super().__init__()
-        self.users_col = users_col
-        self.sessions_col = sessions_col
+        self.users_col = users_col  # None while the cloud is unreachable
+        self.sync = sync
+        monitor.preload_model()  # load the detector while the driver types their credentials
         self.setWindowTitle("Sign In")
         self.setFixedSize(300, 200)
 
@@ -26,12 +28,23 @@ class SignInWindow(QDialog):
         user = self.username_input.text().strip()
         pwd  = self.password_input.text().strip()
 
-        if sign_in(self.users_col, user, pwd):
+        self.signin_btn.setEnabled(False)
+        submit(sign_in, self.users_col, user, pwd, self.sync.store,
+               on_result=lambda ok: self.signin_done(user, ok), on_error=self.signin_failed)
+
+    def signin_done(self, user, ok):
+        self.signin_btn.setEnabled(True)
+        if ok:
             print(f"Sign-in successful for user: {user}")
             self.accept()
 
-            # 🧭 Launch Monitoring Window
-            monitor_window = MonitoringWindow(user, self.sessions_col)
+            # 🧭 Launch Monitoring Window (cv2 / pandas load here, or earlier in the background)
+            from monitoring_window import MonitoringWindow
+            monitor_window = MonitoringWindow(user, self.sync)
             monitor_window.exec_()
         else:
-            QMessageBox.warning(self, "Invalid Credentials", "Username or password is incorrect.")
\ No newline at end of file
+            QMessageBox.warning(self, "Invalid Credentials", "Username or password is incorrect.")
+
+    def signin_failed(self, error):
+        self.signin_btn.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Sign-in failed: {error}")
\ No newline at end of file
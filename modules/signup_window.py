@@ -1,5 +1,6 @@
 from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout, QMessageBox
 from auth_utils import sign_up
+from ui_tasks import submit
 
 class SignUpWindow(QDialog):
     def __init__(self, users_col):
@@ -28,8 +29,19 @@ class SignUpWindow(QDialog):
             QMessageBox.warning(self, "Missing Info", "Please enter both username and password.")
             return
 
-        if sign_up(self.users_col, user, pwd):
+        # network round trip and bcrypt run on the worker pool, the dialog stays responsive
+        self.signup_btn.setEnabled(False)
+        submit(sign_up, self.users_col, user, pwd, on_result=self.signup_done, on_error=self.signup_failed)
+
+    def signup_done(self, created):
+        self.signup_btn.setEnabled(True)
+        user = self.username_input.text().strip()
+        if created:
             QMessageBox.information(self, "Success", f"Account created for '{user}'!")
             self.accept()
         else:
-            QMessageBox.warning(self, "Username Taken", "That username already exists. Please choose another.")
\ No newline at end of file
+            QMessageBox.warning(self, "Username Taken", "That username already exists. Please choose another.")
+
+    def signup_failed(self, error):
+        self.signup_btn.setEnabled(True)
+        QMessageBox.critical(self, "Offline", f"Could not create the account: {error}")
\ No newline at end of file
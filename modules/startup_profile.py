@@ -0,0 +1,105 @@
+'''cold-start measurement for application.py.
+
+the app is launched in a child interpreter with -X importtime; the child reports
+once its first window has been painted and exits, so the parent gets the real
+time-to-first-window (interpreter start included) plus an import breakdown.
+
+    python application.py --profile-startup              # report
+    python application.py --check-startup-budget         # exit status 1 if over STARTUP_BUDGET_MS
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROBE_ENV = "DRIVER_MONITOR_STARTUP_PROBE"
+READY_MARKER = "[STARTUP] first window shown"
+
+
+def is_probe():
+    return os.getenv(PROBE_ENV) == "1"
+
+
+def ready():
+    '''called by the probed app once its first window is up; the stderr copy marks where
+    the imports that delayed it end and background warm-up begins'''
+    print(READY_MARKER, flush=True)
+    print(READY_MARKER, file=sys.stderr, flush=True)
+
+
+def parse_importtime(stderr):
+    '''-X importtime lines -> {top-level import: (self_us, cumulative_us)}, plus per-module self times'''
+    top, modules = {}, {}
+    for line in stderr.splitlines():
+        if line == READY_MARKER:
+            break
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, raw = line[len("import time:"):].split("|", 2)
+        name = raw.strip()
+        modules[name] = int(self_us)
+        if len(raw) - len(raw.lstrip()) == 1:  # no nesting: imported by application.py itself
+            top[name] = (int(self_us), int(cumulative))
+    return top, modules
+
+
+def measure(script, timeout=120.0):
+    '''runs script once as a probe, returns (first_window_ms, top_imports, module_self_times)'''
+    env = dict(os.environ, **{PROBE_ENV: "1"})
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # importtime output goes to a file: a full stderr pipe would stall the child before it reports
+    with tempfile.TemporaryFile("w+") as err:
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-X", "importtime", script], env=env, text=True,
+                                stdout=subprocess.PIPE, stderr=err)
+        first_window_ms = None
+        for line in proc.stdout:
+            if READY_MARKER in line:
+                first_window_ms = (time.perf_counter() - started) * 1000
+                break
+        try:
+            proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+        err.seek(0)
+        top, modules = parse_importtime(err.read())
+    return first_window_ms, top, modules
+
+
+def report(script, budget_ms, runs=3, show=15):
+    '''prints the breakdown of the fastest of `runs` launches; returns True if within budget'''
+    best = None
+    for _ in range(runs):
+        result = measure(script)
+        if result[0] is not None and (best is None or result[0] < best[0]):
+            best = result
+    if best is None:
+        print("[ERROR] The app never showed its first window")
+        return False
+    first_window_ms, top, modules = best
+
+    print(f"[INFO] Time to first window: {first_window_ms:.0f} ms (budget {budget_ms:.0f} ms, best of {runs})")
+    print(f"[INFO] Imports before the first window: {sum(c for _, c in top.values()) / 1000:.0f} ms")
+    print("\n  cumulative ms  import")
+    for name, (_, cum) in sorted(top.items(), key=lambda kv: -kv[1][1])[:show]:
+        print(f"  {cum / 1000:13.1f}  {name}")
+    roots = {}
+    for name, self_us in modules.items():
+        root = name.split(".")[0]
+        roots[root] = roots.get(root, 0) + self_us
+    print("\n  self ms  package")
+    for name, self_us in sorted(roots.items(), key=lambda kv: -kv[1])[:show]:
+        print(f"  {self_us / 1000:7.1f}  {name}")
+    return first_window_ms <= budget_ms
+
+
+def main(script, argv):
+    budget_ms = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+    ok = report(script, budget_ms)
+    if "--check-startup-budget" in argv:
+        if not ok:
+            print(f"[ERROR] Startup exceeded the {budget_ms:.0f} ms budget")
+        sys.exit(0 if ok else 1)
+    sys.exit(0)
@@ -0,0 +1,328 @@
+'''hot-path instrumentation for the monitoring loop: latency histograms, counters and
+gauges, served in the Prometheus text format on a local port and/or written as JSON
+snapshots to a size-rotated log.
+
+while disabled (the default) get() returns NULL, whose series do nothing, so the
+hot path pays one no-op method call per measurement.
+
+    METRICS_PORT=9464 python application.py ...   then   curl localhost:9464/metrics
+    python telemetry.py --bench                       # per-call overhead, enabled vs. disabled
+'''
+import argparse
+import bisect
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# seconds; spans a fast post-processing step up to a stalled camera read
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+# =========================
+# 📊 Series
+# =========================
+class Histogram:
+    '''cumulative-on-read latency histogram. one thread writes a series; readers may
+    see a sample in count before it shows in sum, which scrapes tolerate'''
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        '''upper bound of the bucket holding the q-quantile'''
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class _NullSeries:
+    def observe(self, value):
+        pass
+
+    def inc(self, n=1):
+        pass
+
+
+_NULL_SERIES = _NullSeries()
+
+
+# =========================
+# 🗂️ Registry
+# =========================
+class Telemetry:
+    '''series are created once (histogram() / counter()) and kept by the caller, so
+    recording is a plain method call with no lookups'''
+
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.counters = {}  # (name, labels) -> Counter
+        self.collected = {}  # (name, labels) -> (kind, fn), read at scrape time
+
+    def _key(self, name, help, labels):
+        if help:
+            self.help.setdefault(name, help)
+        return name, tuple(sorted(labels.items()))
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        with self.lock:
+            key = self._key(name, help, labels)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            return self.histograms[key]
+
+    def counter(self, name, help="", **labels):
+        with self.lock:
+            key = self._key(name, help, labels)
+            if key not in self.counters:
+                self.counters[key] = Counter()
+            return self.counters[key]
+
+    def collect(self, name, fn, kind="gauge", help="", **labels):
+        '''fn() is read on every scrape; re-registering the same series replaces it.
+        returns a handle for uncollect()'''
+        with self.lock:
+            key = self._key(name, help, labels)
+            self.collected[key] = entry = (kind, fn)
+            return key, entry
+
+    def uncollect(self, handle):
+        '''drops a collected series, unless it has been re-registered since'''
+        key, entry = handle
+        with self.lock:
+            if self.collected.get(key) is entry:
+                del self.collected[key]
+
+    def _read_collected(self):
+        with self.lock:
+            collected = sorted(self.collected.items())
+        out = []
+        for (name, labels), (kind, fn) in collected:
+            try:
+                out.append((name, labels, kind, float(fn())))
+            except Exception:
+                continue  # a failing fn skips its series for this scrape only
+        return out
+
+    def render(self):
+        '''Prometheus text exposition format'''
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines, typed = [], set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), h in histograms:
+            header(name, "histogram")
+            seen = 0
+            for bound, n in zip(h.bounds + (float("inf"),), h.counts):
+                seen += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', le)])} {seen}")
+            lines.append(f"{name}_sum{_label_text(labels)} {h.sum}")
+            lines.append(f"{name}_count{_label_text(labels)} {h.count}")
+        for (name, labels), c in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {c.value}")
+        for name, labels, kind, value in self._read_collected():
+            header(name, kind)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        '''compact dict for the log: per-histogram count / mean / p95, counters, gauges'''
+        with self.lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+        out = {"time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        for (name, labels), h in histograms:
+            out[name + _label_text(labels)] = {
+                "count": h.count,
+                "mean_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                "p95_ms": h.quantile(0.95) * 1000,
+            }
+        for (name, labels), c in counters:
+            out[name + _label_text(labels)] = c.value
+        for name, labels, _, value in self._read_collected():
+            out[name + _label_text(labels)] = value
+        return out
+
+
+class NullTelemetry:
+    '''what get() returns while instrumentation is off'''
+
+    enabled = False
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        return _NULL_SERIES
+
+    def counter(self, name, help="", **labels):
+        return _NULL_SERIES
+
+    def collect(self, name, fn, kind="gauge", help="", **labels):
+        return None
+
+    def uncollect(self, handle):
+        pass
+
+
+NULL = NullTelemetry()
+_current = NULL
+_lock = threading.Lock()
+
+def get():
+    return _current
+
+
+# =========================
+# 🌐 Exporters
+# =========================
+class MetricsServer(threading.Thread):
+    '''GET /metrics on a local port, for a Prometheus scraper or curl'''
+
+    def __init__(self, telemetry, port, host="127.0.0.1"):
+        super().__init__(daemon=True)
+        tel = telemetry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = tel.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # one line per scrape would drown the console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def run(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MetricsLog(threading.Thread):
+    '''writes a JSON snapshot every interval to a log rotated by size'''
+
+    def __init__(self, telemetry, path, interval=10.0, max_bytes=1_000_000, backups=3):
+        super().__init__(daemon=True)
+        self.telemetry = telemetry
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(f"driver_monitor.metrics.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            self.logger.addHandler(logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                                        backupCount=backups))
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        self.logger.info(json.dumps(self.telemetry.snapshot()))
+
+
+def configure(port=0, log_path="", log_interval=10.0, log_max_bytes=1_000_000, log_backups=3):
+    '''turns instrumentation on once per process if a port or log path is set; returns get()'''
+    global _current
+    with _lock:
+        if _current is not NULL or not (port or log_path):
+            return _current
+        tel = Telemetry()
+        if port:
+            try:
+                server = MetricsServer(tel, port)
+                server.start()
+                print(f"[INFO] Metrics at http://127.0.0.1:{server.port}/metrics")
+            except OSError as e:
+                print(f"[WARN] Metrics endpoint unavailable on port {port}: {e}")
+        if log_path:
+            MetricsLog(tel, log_path, log_interval, log_max_bytes, log_backups).start()
+        _current = tel
+        return tel
+
+
+# =========================
+# 📏 Overhead benchmark
+# =========================
+def run_bench(calls):
+    report = {}
+    for label, tel in (("disabled", NULL), ("enabled", Telemetry())):
+        hist = tel.histogram("bench_seconds", stage="inference")
+        frames = tel.counter("bench_frames_total")
+        t0 = time.perf_counter()
+        for i in range(calls):
+            hist.observe(0.012)
+            frames.inc()
+        report[label + "_ns_per_call"] = (time.perf_counter() - t0) / (2 * calls) * 1e9
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        pass
+    loop_ns = (time.perf_counter() - t0) / calls * 1e9 / 2
+    for key in list(report):
+        report[key] = max(report[key] - loop_ns, 0.0)
+        print(f"[INFO] {key.replace('_ns_per_call', '')}: {report[key]:.0f} ns per measurement")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+    if args.bench:
+        print(json.dumps(run_bench(args.calls), indent=2))
+    else:
+        parser.print_help()
@@ -1,11 +1,17 @@
 
 import time
-import pygame
-import requests
+import threading
+from collections import deque
 import webbrowser
 from dotenv import load_dotenv
 import os
 import sys
+from alert_player import AlertPlayer, create_backend
+from model_registry import ModelRegistry
+from frame_scheduler import AdaptiveFrameScheduler, parse_fps_pair
+import telemetry
+# numpy/requests-backed pieces are imported where they're first used, so the login window
+# (which only reads this module's configuration) doesn't pay for them
 
 
 
@@ -22,21 +28,193 @@ load_dotenv(env_path)
 # Now safely get the API key
 API_KEY = os.getenv("API_KEY")
 
+# Frames buffered between the capture and inference stages (1 = always the freshest frame)
+FRAME_QUEUE_SIZE = int(os.getenv("FRAME_QUEUE_SIZE", "1"))
+
+# "pygame" for the speakers, "null" for headless machines
+AUDIO_BACKEND = os.getenv("AUDIO_BACKEND", "pygame")
+
+# Maps API host (point at fake_maps_server.py to run offline) and reroute cache lifetime
+MAPS_BASE_URL = os.getenv("MAPS_BASE_URL", "https://maps.gomaps.pro")
+REROUTE_CACHE_TTL = float(os.getenv("REROUTE_CACHE_TTL", "600"))
+
+# Local SQLite store sessions and credential hashes are kept in, and seconds of metrics per stored document
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", os.path.join(os.path.expanduser("~"), ".driver_monitor", "local.db"))
+SESSION_BUCKET_SECONDS = int(os.getenv("SESSION_BUCKET_SECONDS", "60"))
+
+# Buckets per upload batch, and the longest wait between sync retries while offline
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "20"))
+SYNC_RETRY_MAX_SECONDS = float(os.getenv("SYNC_RETRY_MAX_SECONDS", "300"))
+
+# Write-ahead logs left by older versions, imported into the local store on start
+SESSION_WAL_DIR = os.getenv("SESSION_WAL_DIR", os.path.join(os.path.expanduser("~"), ".driver_monitor", "wal"))
+
+# Detector weights and how many dummy inferences to run before the first real frame
+MODEL_WEIGHTS = os.getenv("MODEL_WEIGHTS", "path _for_model_weights")
+MODEL_WARMUP_RUNS = int(os.getenv("MODEL_WARMUP_RUNS", "1"))
+
+# Inference backend: auto | torch | onnx | openvino | openvino_int8, and the network input size
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "auto")
+DETECTOR_IMGSZ = int(os.getenv("DETECTOR_IMGSZ", "640"))
+DETECTOR_INT8_DATA = os.getenv("DETECTOR_INT8_DATA")  # calibration dataset yaml for openvino_int8
+
+# Run the detector on a tracked face crop (re-localised on the full frame every N frames)
+FACE_ROI = os.getenv("FACE_ROI", "1") == "1"
+FACE_ROI_FULL_EVERY = int(os.getenv("FACE_ROI_FULL_EVERY", "30"))
+FACE_ROI_IMGSZ = int(os.getenv("FACE_ROI_IMGSZ", "320"))
+FACE_ROI_PAD = float(os.getenv("FACE_ROI_PAD", "0.35"))
+
+# "min,max" inference FPS per state: min while the driver looks alert, max once eye_closed/yawn appears.
+# the NORMAL min must leave no frame gap as long as the shortest blink, or that blink is never seen
+FPS_NORMAL = parse_fps_pair(os.getenv("FPS_NORMAL", "15,30"))
+FPS_MODERATE = parse_fps_pair(os.getenv("FPS_MODERATE", "30,30"))
+FPS_STRONG = parse_fps_pair(os.getenv("FPS_STRONG", "30,30"))
+FPS_ESCALATE_HOLD_SECONDS = float(os.getenv("FPS_ESCALATE_HOLD_SECONDS", "3"))
+MIN_BLINK_SECONDS = float(os.getenv("MIN_BLINK_SECONDS", "0.1"))
+
+# Temporal filter on detections: smoothing time constant (s), on/off confidence thresholds,
+# optional per-class overrides ("yawn=0.5/0.3,head_dropped=0.6/0.4"), how far one class of a
+# pair (eye_open/eye_closed, no_yawn/yawn) must lead to switch state, and how long a prolonged
+# closure / yawn must look over before it ends
+DETECTION_FILTER = os.getenv("DETECTION_FILTER", "1") == "1"
+DETECTION_SMOOTHING_SECONDS = float(os.getenv("DETECTION_SMOOTHING_SECONDS", "0.08"))
+DETECTION_ON_THRESHOLD = float(os.getenv("DETECTION_ON_THRESHOLD", "0.35"))
+DETECTION_OFF_THRESHOLD = float(os.getenv("DETECTION_OFF_THRESHOLD", "0.2"))
+DETECTION_CLASS_THRESHOLDS = os.getenv("DETECTION_CLASS_THRESHOLDS", "")
+DETECTION_STATE_MARGIN = float(os.getenv("DETECTION_STATE_MARGIN", "0.05"))
+DETECTION_RELEASE_SECONDS = float(os.getenv("DETECTION_RELEASE_SECONDS", "0.3"))
+
+# Seconds the MODERATE reroute prompt waits for the driver, and how many unanswered prompts
+# are re-raised (with the strong alarm) before rerouting automatically
+PROMPT_TIMEOUT_SECONDS = float(os.getenv("PROMPT_TIMEOUT_SECONDS", "15"))
+PROMPT_MAX_ESCALATIONS = int(os.getenv("PROMPT_MAX_ESCALATIONS", "1"))
+
+# Pre-event clips saved on STRONG / MODERATE alerts: seconds kept (0 = off), frames per second,
+# hard memory cap of the compressed ring, frame width (0 = camera size) and JPEG quality
+CLIP_DIR = os.getenv("CLIP_DIR", os.path.join(os.path.expanduser("~"), ".driver_monitor", "clips"))
+CLIP_SECONDS = float(os.getenv("CLIP_SECONDS", "10"))
+CLIP_FPS = float(os.getenv("CLIP_FPS", "10"))
+CLIP_MAX_MB = float(os.getenv("CLIP_MAX_MB", "24"))
+CLIP_WIDTH = int(os.getenv("CLIP_WIDTH", "480"))
+CLIP_JPEG_QUALITY = int(os.getenv("CLIP_JPEG_QUALITY", "70"))
+
+# Live camera preview in the monitoring window, frames per second (0 = no preview)
+PREVIEW_FPS = float(os.getenv("PREVIEW_FPS", "10"))
+
+# Log GUI-thread stalls longer than this many ms (0 = off)
+UI_STALL_REPORT_MS = int(os.getenv("UI_STALL_REPORT_MS", "0"))
+
+# Hot-path instrumentation: local Prometheus endpoint port and/or a size-rotated JSON log of
+# snapshots every N seconds (both off = no instrumentation overhead)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "")
+METRICS_LOG_INTERVAL_SECONDS = float(os.getenv("METRICS_LOG_INTERVAL_SECONDS", "10"))
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", "1000000"))
+METRICS_LOG_BACKUPS = int(os.getenv("METRICS_LOG_BACKUPS", "3"))
+
+# Rolling windows (seconds) for blink/yawn counts and for PERCLOS
+TRACKER_WINDOW_SECONDS = float(os.getenv("TRACKER_WINDOW_SECONDS", "120"))
+PERCLOS_WINDOW_SECONDS = float(os.getenv("PERCLOS_WINDOW_SECONDS", "60"))
+
+# =========================
+# 🧠 Detector Model
+# =========================
+def _load_detector(weights):
+    from detector_backends import Detector
+    detector = Detector(resource_path(weights), DETECTOR_BACKEND, DETECTOR_IMGSZ, DETECTOR_INT8_DATA)
+    print(f"[INFO] Detector backend: {detector.backend} ({detector.path})")
+    return detector
+
+_model_registry = ModelRegistry(_load_detector, warmup_runs=MODEL_WARMUP_RUNS)
+
+def preload_model():
+    # safe to call repeatedly, loads and warms up the weights once in the background
+    _model_registry.preload(MODEL_WEIGHTS)
+
+def get_model():
+    return _model_registry.get(MODEL_WEIGHTS)
+
+def _load_batch_detector(weights):
+    from detector_backends import Detector
+    # the ONNX / OpenVINO exports take one frame per call; only torch runs a list as one batch
+    return Detector(resource_path(weights), "torch", DETECTOR_IMGSZ)
+
+_batch_registry = ModelRegistry(_load_batch_detector, warmup_runs=MODEL_WARMUP_RUNS)
+
+def get_batch_model():
+    # monitoring_server's detector: torch whatever DETECTOR_BACKEND says
+    return _batch_registry.get(MODEL_WEIGHTS)
+
+def model_load_report():
+    return _model_registry.report(MODEL_WEIGHTS)
+
+def make_frame_scheduler():
+    scheduler = AdaptiveFrameScheduler(
+        {"NORMAL": FPS_NORMAL, "MODERATE": FPS_MODERATE, "STRONG": FPS_STRONG},
+        hold_seconds=FPS_ESCALATE_HOLD_SECONDS
+    )
+    if scheduler.max_onset_error() >= MIN_BLINK_SECONDS:
+        print(f"[WARN] FPS_NORMAL idles at {FPS_NORMAL[0]:g} fps: a {MIN_BLINK_SECONDS * 1000:.0f} ms blink can fall "
+              f"between two frames and go uncounted (needs more than {1 / MIN_BLINK_SECONDS:g} fps)")
+    return scheduler
+
+def make_frame_detector(model):
+    # per-session callable: frame -> Results, cropped to the face when FACE_ROI is on
+    if not FACE_ROI:
+        return model
+    from face_roi import FaceROITracker
+    roi_imgsz = FACE_ROI_IMGSZ
+    if getattr(model, "fixed_imgsz", False) and roi_imgsz != model.imgsz:
+        # exported backends have a static input shape, crops run at the export size
+        print(f"[INFO] {model.backend} export is fixed at {model.imgsz}px, face crops use it instead of {roi_imgsz}px")
+        roi_imgsz = model.imgsz
+    return FaceROITracker(model, full_every=FACE_ROI_FULL_EVERY, pad=FACE_ROI_PAD, roi_imgsz=roi_imgsz)
+
+def make_clip_recorder(session_id):
+    # per-session pre-event ring, None when clips are off
+    if CLIP_SECONDS <= 0:
+        return None
+    from event_clips import ClipRecorder
+    return ClipRecorder(CLIP_DIR, session_id, CLIP_SECONDS, CLIP_FPS, int(CLIP_MAX_MB * 1024 * 1024),
+                        CLIP_WIDTH, CLIP_JPEG_QUALITY)
+
+def get_telemetry():
+    # process-wide; telemetry.NULL (no-op series) unless a metrics port or log is configured
+    return telemetry.configure(METRICS_PORT, METRICS_LOG_PATH, METRICS_LOG_INTERVAL_SECONDS,
+                               METRICS_LOG_MAX_BYTES, METRICS_LOG_BACKUPS)
+
+def make_detection_filter(table):
+    # per-session temporal filter over the feature vector, None keeps the raw per-frame class set
+    if not DETECTION_FILTER:
+        return None
+    from detection_filter import DetectionFilter, parse_class_thresholds
+    return DetectionFilter(table, on=DETECTION_ON_THRESHOLD, off=DETECTION_OFF_THRESHOLD,
+                           tau=DETECTION_SMOOTHING_SECONDS, margin=DETECTION_STATE_MARGIN,
+                           release=DETECTION_RELEASE_SECONDS, class_thresholds=parse_class_thresholds(DETECTION_CLASS_THRESHOLDS))
+
 # =========================
 # 🔔 Sound Playback
 # =========================
+SOUND_MAP = {
+    "strong_alarm": "sounds/emergency-alarm-with-reverb-29431.mp3",
+    "alarm": "sounds/beep-beep-beep-beep-80262.mp3"
+}
+
+_alert_player = None
+_alert_player_lock = threading.Lock()
+
+def get_alert_player():
+    # mixer init and clip decoding happen once, on first use
+    global _alert_player
+    with _alert_player_lock:
+        if _alert_player is None:
+            _alert_player = AlertPlayer(SOUND_MAP, create_backend(AUDIO_BACKEND), resource_path)
+        return _alert_player
+
 def play_sound(sound_type):
-    sound_map = {
-        "strong_alarm": "sounds/emergency-alarm-with-reverb-29431.mp3",
-        "alarm": "sounds/beep-beep-beep-beep-80262.mp3"
-    }
-
-    if sound_type in sound_map:
-        pygame.mixer.init()
-        pygame.mixer.music.load(resource_path(sound_map[sound_type]))
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
+    # returns immediately, the alert keeps sounding while monitoring continues
+    if sound_type in SOUND_MAP:
+        get_alert_player().play(sound_type)
 
 # =========================
 # 🧠 Drowsiness Logic
@@ -69,129 +247,205 @@ def get_user_coordinates():
 
     return "19.107094,73.066216"  # this is for testong purpose, Replace with dynamic GPS later
 
+_reroute_engine = None
+_reroute_engine_lock = threading.Lock()
+
+def get_reroute_engine():
+    global _reroute_engine
+    with _reroute_engine_lock:
+        if _reroute_engine is None:
+            from reroute_engine import GoMapsBackend, RerouteEngine
+            _reroute_engine = RerouteEngine(GoMapsBackend(API_KEY, base_url=MAPS_BASE_URL),
+                                            cache_ttl=REROUTE_CACHE_TTL)
+        return _reroute_engine
+
 def find_nearest_refreshment_stops(origin_loc, types=("gas_station", "restaurant"), limit=4):
+    engine = get_reroute_engine()
     all_results = []
     for place_type in types:
-        url = "https://maps.gomaps.pro/maps/api/place/nearbysearch/json"
-        params = {
-            "location": origin_loc,
-            "rankby": "distance",
-            "type": place_type,
-            "key": API_KEY
-        }
-        res = requests.get(url, params=params).json()
-        results = res.get("results", [])[:limit]
-        for place in results:
-            place["place_type"] = place_type
-        all_results.extend(results)
+        all_results.extend(engine.places(origin_loc, place_type)[:limit])
     return all_results
 
 def get_route(origin_loc, dest_latlng):
-    url = "https://maps.gomaps.pro/maps/api/directions/json"
-    params = {
-        "origin": origin_loc,
-        "destination": f"{dest_latlng['lat']},{dest_latlng['lng']}",
-        "mode": "driving",
-        "key": API_KEY
-    }
-    res = requests.get(url, params=params).json()
-    if "routes" in res and res["routes"]:
-        return res["routes"][0]["legs"][0]
-    return None
+    return get_reroute_engine().route(origin_loc, dest_latlng)
+
+def open_directions(origin, nearest):
+    if not nearest:
+        print("[WARN] No reachable refreshment stop found.")
+        return
+    stop = nearest["stop"]
+    print(f"\nNearest Stop: {stop['name']} ({stop['place_type']})")
+    print(f"Distance: {nearest['route']['distance']['text']} | ETA: {nearest['route']['duration']['text']}")
+    url = f"https://www.google.com/maps/dir/?api=1&origin={origin}&destination={stop['geometry']['location']['lat']},{stop['geometry']['location']['lng']}&travelmode=driving"
+    webbrowser.open(url)
+
+def prefetch_reroute():
+    # called while the driver is NORMAL so a later reroute is served from cache
+    get_reroute_engine().prefetch(get_user_coordinates())
+
+def reroute_to_nearest_stop_async(callback=None):
+    # returns immediately; directions open (and callback fires) once the lookup finishes
+    origin = get_user_coordinates()
+
+    def done(nearest):
+        open_directions(origin, nearest)
+        if callback:
+            callback(nearest)
+    get_reroute_engine().reroute_async(origin, done)
 
 def reroute_to_nearest_stop():
     origin = get_user_coordinates()
-    stops = find_nearest_refreshment_stops(origin)
-    nearest = None
-    min_dist = float("inf")
-    for stop in stops:
-        route = get_route(origin, stop["geometry"]["location"])
-        if route and route["distance"]["value"] < min_dist:
-            min_dist = route["distance"]["value"]
-            nearest = {"stop": stop, "route": route}
-
-    if nearest:
-        stop = nearest["stop"]
-        print(f"\nNearest Stop: {stop['name']} ({stop['place_type']})")
-        print(f"Distance: {nearest['route']['distance']['text']} | ETA: {nearest['route']['duration']['text']}")
-        url = f"https://www.google.com/maps/dir/?api=1&origin={origin}&destination={stop['geometry']['location']['lat']},{stop['geometry']['location']['lng']}&travelmode=driving"
-        webbrowser.open(url)
+    nearest = get_reroute_engine().find_nearest(origin)
+    open_directions(origin, nearest)
+    return nearest
 
 
 # =========================
 # 👁️ Blink and Yawn Trackers
 # =========================
+class RollingRatio:
+    '''fraction of time a condition held over the last `window` seconds.
+    time is accumulated into a fixed ring of buckets, so an update is O(1) and allocates nothing.'''
+
+    def __init__(self, window=60, resolution=1.0):
+        self.size = max(1, int(round(window / resolution)))
+        self.resolution = resolution
+        self.hit = [0.0] * self.size
+        self.total = [0.0] * self.size
+        self.reset()
+
+    def reset(self):
+        for i in range(self.size):
+            self.hit[i] = self.total[i] = 0.0
+        self.hit_sum = self.total_sum = 0.0
+        self.current = None  # absolute index of the newest bucket
+
+    def add(self, now, dt, hit):
+        b = int(now // self.resolution)
+        if self.current is None:
+            self.current = b
+        elif b > self.current:
+            for k in range(1, min(b - self.current, self.size) + 1):
+                i = (self.current + k) % self.size
+                self.hit_sum -= self.hit[i]
+                self.total_sum -= self.total[i]
+                self.hit[i] = self.total[i] = 0.0
+            self.current = b
+        i = b % self.size
+        self.total[i] += dt
+        self.total_sum += dt
+        if hit:
+            self.hit[i] += dt
+            self.hit_sum += dt
+
+    def ratio(self):
+        return self.hit_sum / self.total_sum if self.total_sum > 1e-9 else 0.0
+
+
 class BlinkTracker:
-    def __init__(self):
+    # frame gaps longer than this (paused loop, dialog) don't count towards PERCLOS
+    MAX_FRAME_GAP = 1.0
+
+    def __init__(self, window=None, perclos_window=None, clock=time.monotonic):
+        self.window = window or TRACKER_WINDOW_SECONDS
+        self.clock = clock
+        self.perclos_ratio = RollingRatio(perclos_window or PERCLOS_WINDOW_SECONDS)
         self.reset()
 
     def reset(self):
         self.prev = "eye_open"
-        self.blinks = []
-        self.blink_durations = []
+        self.blinks = deque()  # (start, duration), oldest first
+        self.duration_sum = 0.0
         self.start = None
         self.total_eye_closure_duration = 0
         self.closure_start = None
-
-
-    def update(self, classes):
+        self.last_seen = None
+        self.perclos_ratio.reset()
+
+
+    def update(self, classes, timestamp=None):
+        # timestamp: when the frame was captured (same clock as self.clock),
+        # so closure timing isn't skewed by inference time
+        now = timestamp if timestamp is not None else self.clock()
+        # the eyes changed state somewhere between the previous frame and this one,
+        # the midpoint keeps blink durations unbiased when frames are sparse
+        edge = (self.last_seen + now) / 2 if self.last_seen is not None else now
+        if self.last_seen is not None:
+            self.perclos_ratio.add(now, min(now - self.last_seen, self.MAX_FRAME_GAP), self.prev == "eye_closed")
+        self.last_seen = now
         eye_closed = "eye_closed" in classes
 
         if eye_closed:
             if self.prev == "eye_open":
-                self.start = time.time()  # start of blink
-                self.closure_start = time.time()  # start of prolonged closure
-            elif self.closure_start:
-                self.total_eye_closure_duration = time.time() - self.closure_start
+                self.start = edge  # start of blink
+                self.closure_start = edge  # start of prolonged closure
+            elif self.closure_start is not None:
+                self.total_eye_closure_duration = now - self.closure_start
 
         elif not eye_closed and self.prev == "eye_closed":
-            if self.start:
-                blink_duration = time.time() - self.start
-                self.blink_durations.append(blink_duration)
-                self.blinks.append(self.start)
+            if self.start is not None:
+                blink_duration = edge - self.start
+                self.blinks.append((self.start, blink_duration))
+                self.duration_sum += blink_duration
                 self.start = None
                 self.closure_start = None
                 self.total_eye_closure_duration = 0
 
 
         self.prev = "eye_closed" if eye_closed else "eye_open"
-        self.cleanup()
+        self.cleanup(now)
 
-    def cleanup(self):
-        # keep only recent 2 mins of data
-        self.blinks = [t for t in self.blinks if time.time() - t <= 120]
-        self.blink_durations = self.blink_durations[-len(self.blinks):]
+    def cleanup(self, now=None):
+        # keep only the recent window of blinks, durations leave together with their blink
+        horizon = (now if now is not None else self.clock()) - self.window
+        while self.blinks and self.blinks[0][0] < horizon:
+            self.duration_sum -= self.blinks.popleft()[1]
+        if not self.blinks:
+            self.duration_sum = 0.0  # drop accumulated float error
 
     def get_stats(self):
         blink_count = len(self.blinks)
-        avg_duration = sum(self.blink_durations) / blink_count if blink_count else 0
+        avg_duration = self.duration_sum / blink_count if blink_count else 0
         return blink_count, avg_duration, self.total_eye_closure_duration
 
+    def perclos(self):
+        '''fraction of the PERCLOS window the eyes were closed'''
+        return self.perclos_ratio.ratio()
+
+    def blink_rate(self):
+        '''blinks per minute over the window'''
+        return len(self.blinks) * 60.0 / self.window
+
 
 class YawnTracker:
-    def __init__(self):
+    def __init__(self, window=None, clock=time.monotonic):
+        self.window = window or TRACKER_WINDOW_SECONDS
+        self.clock = clock
         self.reset()
 
     def reset(self):
         self.prev = "no_yawn"
-        self.timestamps = []
+        self.timestamps = deque()
         self.start = None
 
-    def update(self, classes):
+    def update(self, classes, timestamp=None):
+        now = timestamp if timestamp is not None else self.clock()
         if "yawn" in classes:
             if self.prev == "no_yawn":
-                self.start = time.time()
-        elif "no_yawn" in classes and self.prev == "yawn" and self.start:
-            duration = time.time() - self.start
+                self.start = now
+        elif "no_yawn" in classes and self.prev == "yawn" and self.start is not None:
+            duration = now - self.start
             if 2 <= duration <= 10:
                 self.timestamps.append(self.start)
             self.start = None
 
         self.prev = "yawn" if "yawn" in classes else "no_yawn"
-        self.cleanup()
+        self.cleanup(now)
 
-    def cleanup(self):
-        self.timestamps = [t for t in self.timestamps if time.time() - t <= 120]
+    def cleanup(self, now=None):
+        horizon = (now if now is not None else self.clock()) - self.window
+        while self.timestamps and self.timestamps[0] < horizon:
+            self.timestamps.popleft()
 
     def get_stats(self):
         return len(self.timestamps)
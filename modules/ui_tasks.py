@@ -0,0 +1,155 @@
+'''runs blocking work (network calls, bcrypt) off the Qt GUI thread, and measures
+how long the GUI thread is stalled.
+
+    python ui_tasks.py --latency 0.3     # sign-in stall on the GUI thread vs. via the worker pool
+'''
+import argparse
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+
+# =========================
+# 🧵 Worker pool
+# =========================
+class TaskSignals(QObject):
+    # created on the GUI thread, so emits from a worker are delivered there as queued calls
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+
+
+class Task(QRunnable):
+    def __init__(self, fn, args, kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            out = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(e)
+        else:
+            self.signals.result.emit(out)
+        finally:
+            _running.discard(self)
+
+
+_pool = None
+_running = set()  # keeps the Python side of queued tasks alive until they finish
+
+def task_pool():
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(4)
+    return _pool
+
+def submit(fn, *args, on_result=None, on_error=None, **kwargs):
+    '''runs fn(*args, **kwargs) on the pool; on_result / on_error are called on the GUI thread'''
+    task = Task(fn, args, kwargs)
+    if on_result:
+        task.signals.result.connect(on_result)
+    task.signals.error.connect(on_error or (lambda e: print(f"[ERROR] Background task failed: {e}")))
+    _running.add(task)
+    task_pool().start(task)
+    return task
+
+
+# =========================
+# ⏱️ GUI stall monitor
+# =========================
+class UIStallMonitor(QObject):
+    '''a heartbeat timer on the GUI thread; how late each tick fires is how long
+    the event loop was blocked'''
+
+    def __init__(self, interval_ms=10, report_over_ms=100):
+        super().__init__()
+        self.interval = interval_ms / 1000
+        self.report_over = report_over_ms / 1000
+        self.stalls = []
+        self.last = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._tick)
+
+    def start(self):
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        stall = now - self.last - self.interval
+        self.last = now
+        if stall > 0.005:
+            self.stalls.append(stall)
+            if stall > self.report_over:
+                print(f"[WARN] GUI thread stalled for {stall * 1000:.0f} ms")
+
+    def report(self):
+        s = sorted(self.stalls)
+        return {
+            "stalls": len(s),
+            "max_ms": s[-1] * 1000 if s else 0.0,
+            "p95_ms": s[int(len(s) * 0.95)] * 1000 if s else 0.0,
+            "total_ms": sum(s) * 1000,
+        }
+
+
+# =========================
+# 📏 Benchmark
+# =========================
+class _SlowUsers:
+    '''users_col stand-in that answers after a fixed network latency'''
+
+    def __init__(self, latency, user):
+        self.latency = latency
+        self.user = user
+
+    def find_one(self, query):
+        time.sleep(self.latency)
+        return self.user if query["username"] == self.user["username"] else None
+
+
+def run_stall_bench(latency, attempts):
+    import bcrypt
+    from PyQt5.QtWidgets import QApplication
+    from auth_utils import sign_in
+
+    app = QApplication.instance() or QApplication(["ui_tasks"])
+    users = _SlowUsers(latency, {"username": "driver", "pw_hash": bcrypt.hashpw(b"secret", bcrypt.gensalt())})
+    report = {}
+    for mode in ("gui_thread", "worker_pool"):
+        monitor = UIStallMonitor(report_over_ms=10 ** 6)
+        done = threading.Semaphore(0)
+        monitor.start()
+        for _ in range(attempts):
+            if mode == "gui_thread":
+                QTimer.singleShot(0, lambda: (sign_in(users, "driver", "secret"), done.release()))
+            else:
+                QTimer.singleShot(0, lambda: submit(sign_in, users, "driver", "secret",
+                                                    on_result=lambda _: done.release()))
+            idle_until = None
+            while idle_until is None or time.perf_counter() < idle_until:
+                if idle_until is None and done.acquire(blocking=False):
+                    idle_until = time.perf_counter() + 0.05  # let the heartbeat catch up between attempts
+                app.processEvents()
+                time.sleep(0.001)
+        monitor.stop()
+        report[mode] = monitor.report()
+        print(f"[INFO] {mode}: max stall {report[mode]['max_ms']:.0f} ms, total {report[mode]['total_ms']:.0f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated DB round trip, seconds")
+    parser.add_argument("--attempts", type=int, default=5)
+    args = parser.parse_args()
+    run_stall_bench(args.latency, args.attempts)